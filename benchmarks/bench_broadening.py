@@ -0,0 +1,74 @@
+"""
+accuracy and speed of the FFT broadening (FFTBroadening) compared to the
+direct evaluation (lorentzianBatch).
+
+Random peaks are placed within the padded grid (all peaks binned) and in a
+wider range (peaks outside of the padded grid are evaluated directly). The
+error is the maximal deviation relative to the maximum of the direct spectrum.
+At the end the TA map of a synthetic tree (see synthetic.py) is built with
+both backends.
+
+usage: python benchmarks/bench_broadening.py [n_grid] [repeat]
+
+Author: Tobias Kaczun
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from qextract.ta_extract import TAtoHDF5
+from qextract.ta_util import FFTBroadening, GetTA, lorentzianBatch
+
+import synthetic
+
+
+def bestTime(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def relativeError(result, reference):
+    return np.abs(result - reference).max() / np.abs(reference).max()
+
+
+def main(n_grid=1000, repeat=5):
+    rng = np.random.default_rng(0)
+    x = np.linspace(270, 300, n_grid)
+
+    start = time.perf_counter()
+    broadener = FFTBroadening(x)
+    t_setup = time.perf_counter() - start
+    print('grid {} points, oversample {}, fft size {}, setup {:.2f}ms'.format(
+        n_grid, broadener.oversample, broadener.n_fft, 1e3 * t_setup))
+
+    print('{:<10} {:>8} {:>12} {:>12} {:>8} {:>10}'.format('peaks in', 'peaks', 'direct', 'fft', 'speedup', 'rel. error'))
+    for low, high, label in ((262, 308, 'padded'), (200, 370, 'wide')):
+        for n_peaks in (10, 100, 1000, 10000, 100000):
+            exc = rng.uniform(low, high, n_peaks)
+            osc = rng.exponential(1e-3, n_peaks)
+            t_direct, direct = bestTime(lambda: lorentzianBatch(x, exc, osc), repeat)
+            t_fft, fft = bestTime(lambda: broadener(exc, osc), repeat)
+            print('{:<10} {:>8} {:>10.2f}ms {:>10.2f}ms {:>7.1f}x {:>10.1e}'.format(
+                label, n_peaks, 1e3 * t_direct, 1e3 * t_fft, t_direct / t_fft, relativeError(fft, direct)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, 'tree')
+        synthetic.writeTree(root, 5, 20, 20, 40)
+        filename = os.path.join(directory, 'ta.hdf5')
+        TAtoHDF5().createHDF5(root, filename)
+
+        t_direct, direct = bestTime(lambda: GetTA(filename, x).ta.ta, repeat)
+        t_fft, fft = bestTime(lambda: GetTA(filename, x, broadening='fft').ta.ta, repeat)
+        print('GetTA      direct {:.2f}ms  fft {:.2f}ms  rel. error {:.1e}'.format(
+            1e3 * t_direct, 1e3 * t_fft, relativeError(fft, direct)))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
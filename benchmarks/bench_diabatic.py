@@ -0,0 +1,51 @@
+"""
+diabatic state resolved TA maps with GetTA.diabaticDecomposition compared to
+one GetTA per diabatic state (plus one for the total map).
+
+usage: python benchmarks/bench_diabatic.py [n_times] [n_structures]
+
+Author: Tobias Kaczun
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from qextract.ta_extract import TAtoHDF5
+from qextract.ta_util import GetTA
+
+import synthetic
+
+
+def main(n_times=10, n_structures=100):
+    wavelength_arr = np.linspace(270, 300, 1000)
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, 'tree')
+        synthetic.writeTree(root, n_times, n_structures, 20, 40)
+        filename = os.path.join(directory, 'ta.hdf5')
+        TAtoHDF5().createHDF5(root, filename)
+
+        for use_peak_table in (True, False):
+            start = time.perf_counter()
+            decomposition = GetTA(filename, wavelength_arr, use_peak_table=use_peak_table,
+                                  build=False).diabaticDecomposition()
+            t_single = time.perf_counter() - start
+
+            start = time.perf_counter()
+            total = GetTA(filename, wavelength_arr, use_peak_table=use_peak_table).ta.ta
+            states = [GetTA(filename, wavelength_arr, use_peak_table=use_peak_table,
+                            diabatic_state=int(state)).ta.ta for state in decomposition.states]
+            t_separate = time.perf_counter() - start
+
+            identical = np.array_equal(decomposition.ta, total) and all(
+                np.array_equal(decomposition.maps[:, :, k], state) for k, state in enumerate(states))
+            print('{:<12} {} states: one GetTA per state {:.3f}s  single pass {:.3f}s  {:.1f}x  identical={}'.format(
+                'peak table' if use_peak_table else 'groups', len(decomposition.states), t_separate, t_single,
+                t_separate / t_single, identical))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
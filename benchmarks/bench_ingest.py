@@ -0,0 +1,88 @@
+"""
+throughput benchmark for TAtoHDF5.createHDF5 with serial and process pool parsing.
+
+Builds a synthetic directory tree of the form
+
+root/0.0/StructureN_bla.out
+root/2.0/StructureN_bla.out
+...
+
+from the FANO sample output in data/ and ingests it once per worker count.
+The resulting hdf5 Files are compared to make sure the group layout and the
+data are identical to the serial path.
+
+usage: python benchmarks/bench_ingest.py [n_times] [n_structures] [workers ...]
+
+Author: Tobias Kaczun
+"""
+import os
+import sys
+import shutil
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+from qextract import ta_extract
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'gs_631ppGss.out')
+
+
+def buildTree(root, n_times, n_structures):
+    for t in range(n_times):
+        time_dir = os.path.join(root, '{:.1f}'.format(2 * t))
+        os.makedirs(time_dir)
+        for s in range(n_structures):
+            shutil.copyfile(SAMPLE, os.path.join(time_dir, 'Structure{}_631ppGss.out'.format(s)))
+
+
+def hdf5Content(filename):
+    content = {}
+    with h5py.File(filename, 'r') as hdf5File:
+        def visit(name, obj):
+            if isinstance(obj, h5py.Dataset):
+                content[name] = obj[()]
+            else:
+                content[name] = None
+        hdf5File.visititems(visit)
+    return content
+
+
+def sameContent(a, b):
+    if list(a) != list(b):
+        return False
+    return all(a[key] is None or np.array_equal(a[key], b[key]) for key in a)
+
+
+def main(n_times=10, n_structures=10, workers=(1, 2, 4)):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        root = os.path.join(tmpdir, 'tree')
+        buildTree(root, n_times, n_structures)
+        n_files = n_times * n_structures
+
+        reference = None
+        for n in workers:
+            filename = os.path.join(tmpdir, 'ta_{}.hdf5'.format(n))
+            start = time.perf_counter()
+            ta_extract.TAtoHDF5().createHDF5(root, filename, workers=n)
+            elapsed = time.perf_counter() - start
+
+            content = hdf5Content(filename)
+            if reference is None:
+                reference = content
+            identical = sameContent(reference, content)
+
+            print('workers={:3d}  {:8.2f} s  {:8.1f} files/s  identical={}'.format(
+                n, elapsed, n_files / elapsed, identical))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    args = [int(x) for x in sys.argv[1:]]
+    if len(args) > 2:
+        main(args[0], args[1], args[2:])
+    else:
+        main(*args)
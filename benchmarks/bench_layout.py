@@ -0,0 +1,83 @@
+"""
+file size, write and read time of the per file datasets of TAtoHDF5 for the
+groups and block layouts with different dataset options.
+
+A synthetic tree (see synthetic.py) is parsed once, then the parsed data is
+written with every configuration (without peak table, so only the per file
+datasets and populations are written) and the TA spectrum is built from the
+nested datasets (GetTA with use_peak_table=False). The spectra of all
+configurations are compared to the default (groups, contiguous).
+
+usage: python benchmarks/bench_layout.py [n_times] [n_structures] [n_pump] [n_probe]
+
+Author: Tobias Kaczun
+"""
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+from qextract.ta_extract import TAtoHDF5, parseOutputFile
+from qextract.ta_util import GetTA
+
+import synthetic
+
+CONFIGURATIONS = [
+    ('groups', {}),
+    ('groups', {'chunks': True, 'compression': 'gzip', 'shuffle': True}),
+    ('block', {}),
+    ('block', {'chunks': True, 'compression': 'gzip', 'shuffle': True}),
+    ('block', {'chunks': True, 'compression': 'lzf', 'shuffle': True}),
+]
+
+
+def writeParsed(root, parsed, filename, layout, dataset_options):
+    converter = TAtoHDF5()
+    converter.pathname = root + '/'
+    converter.layout = layout
+    converter.dataset_options = dataset_options
+
+    start = time.perf_counter()
+    with h5py.File(filename, 'w') as hdf5File:
+        for filepath, pumps, fingerprint in parsed:
+            converter.writePumps(hdf5File, filepath, pumps, fingerprint)
+        converter.setAdibaticPop(hdf5File)
+        converter.setDiabaticPop(hdf5File)
+    return time.perf_counter() - start
+
+
+def main(n_times=10, n_structures=50, n_pump=20, n_probe=40):
+    wavelength_arr = np.linspace(270, 300, 500)
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, 'tree')
+        synthetic.writeTree(root, n_times, n_structures, n_pump, n_probe)
+        parsed = [parseOutputFile(filepath) for filepath in sorted(glob.glob(root + '/*/*.out'))]
+
+        print('{} files, {} pumps x {} probes'.format(len(parsed), n_pump, n_probe))
+        print('{:<8} {:<44} {:>10} {:>10} {:>10} {:>10}'.format(
+            'layout', 'options', 'size [MB]', 'write', 'read', 'identical'))
+
+        reference = None
+        for i, (layout, dataset_options) in enumerate(CONFIGURATIONS):
+            filename = os.path.join(directory, '{}.hdf5'.format(i))
+            t_write = writeParsed(root, parsed, filename, layout, dataset_options)
+
+            start = time.perf_counter()
+            ta = GetTA(filename, wavelength_arr, use_peak_table=False).ta.ta
+            t_read = time.perf_counter() - start
+
+            if reference is None:
+                reference = ta
+            options = ','.join('{}={}'.format(key, value) for key, value in dataset_options.items()) or '-'
+            print('{:<8} {:<44} {:>10.2f} {:>9.3f}s {:>9.3f}s {:>10}'.format(
+                layout, options, os.path.getsize(filename) / 2**20, t_write, t_read,
+                str(np.array_equal(ta, reference))))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:5]])
@@ -0,0 +1,56 @@
+"""
+scaling of GetTA with the trajectories distributed to worker processes.
+
+A synthetic tree (see synthetic.py) is ingested, then the TA tensor is built
+serially and with 2, 4, ... processes up to the number of cores (or the given
+worker counts), from the peak table and from the nested groups. The tensors
+have to be bit-identical to the serial ones.
+
+usage: python benchmarks/bench_parallel_ta.py [n_times] [n_structures] [workers ...]
+
+Author: Tobias Kaczun
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from qextract.ta_extract import TAtoHDF5
+from qextract.ta_util import GetTA
+
+import synthetic
+
+
+def main(n_times=10, n_structures=200, workers=None):
+    if workers is None:
+        workers = [1]
+        while workers[-1] * 2 <= (os.cpu_count() or 1):
+            workers.append(workers[-1] * 2)
+    wavelength_arr = np.linspace(270, 300, 1000)
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, 'tree')
+        synthetic.writeTree(root, n_times, n_structures, 20, 40)
+        filename = os.path.join(directory, 'ta.hdf5')
+        TAtoHDF5().createHDF5(root, filename)
+
+        print('{} time steps x {} trajectories, {} cores'.format(n_times, n_structures, os.cpu_count()))
+        for use_peak_table in (True, False):
+            serial = None
+            for n_workers in workers:
+                start = time.perf_counter()
+                ta = GetTA(filename, wavelength_arr, use_peak_table=use_peak_table, workers=n_workers).ta
+                seconds = time.perf_counter() - start
+
+                if serial is None:
+                    serial = (seconds, ta)
+                print('{:<12} workers={:>3} {:>8.3f}s {:>6.2f}x  identical={}'.format(
+                    'peak table' if use_peak_table else 'groups', n_workers, seconds, serial[0] / seconds,
+                    np.array_equal(ta.tensor, serial[1].tensor) and np.array_equal(ta.ta, serial[1].ta)))
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args[:2], workers=args[2:] or None)
@@ -0,0 +1,101 @@
+"""
+compares the line by line ExtractFile with the single pass ScanFile on the
+sample outputs in data/.
+
+For every file both parsers are run `repeat` times, the best time is reported
+together with the speedup and whether both return the same data. The last
+column is the time of a status scan (success and cpu only) with
+ScanFile(lazy=True), which does not parse the excitation sections. With pad > 0
+the iteration log between the $rem section and the first excited state summary
+is repeated `pad` times to mimic large production outputs.
+
+usage: python benchmarks/bench_parse.py [repeat] [pad] [files ...]
+
+Author: Tobias Kaczun
+"""
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from qextract import extract, scan
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+def bestTime(func, filename, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(filename)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def sameData(a, b):
+    if list(a.__dict__) != list(b.__dict__):
+        return False
+    for key, value in a.__dict__.items():
+        other = b.__dict__[key]
+        if isinstance(value, pd.DataFrame):
+            if not value.equals(other):
+                return False
+        elif value != other:
+            return False
+    return True
+
+
+def statusScan(filename):
+    data = scan.ScanFile(lazy=True).extractFile(filename)
+    return data.success, data.cpu
+
+
+def padFile(filename, pad, tmpdir):
+    with open(filename) as outfile:
+        text = outfile.read()
+
+    start = text.find('$end', text.find('$rem'))
+    start = text.find('\n', start) + 1
+    end = text.find('Excited State Summary')
+    end = text.rfind('\n', 0, end) + 1
+
+    padded = os.path.join(tmpdir, os.path.basename(filename))
+    with open(padded, 'w') as outfile:
+        outfile.write(text[:start] + pad * text[start:end] + text[end:])
+    return padded
+
+
+def main(repeat=20, pad=0, files=None):
+    if not files:
+        files = sorted(glob.glob(os.path.join(DATA, '*.out')))
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        if pad > 0:
+            files = [padFile(filename, pad, tmpdir) for filename in files]
+        compare(files, repeat)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def compare(files, repeat):
+    print('{:<20} {:>12} {:>12} {:>8}  {:<9} {:>12}'.format(
+        'file', 'ExtractFile', 'ScanFile', 'speedup', 'identical', 'status scan'))
+    for filename in files:
+        t_old, old = bestTime(extract.ExtractFile().extractFile, filename, repeat)
+        t_new, new = bestTime(scan.ScanFile().extractFile, filename, repeat)
+        t_status, _ = bestTime(statusScan, filename, repeat)
+        print('{:<20} {:>10.2f}ms {:>10.2f}ms {:>7.1f}x  {:<9} {:>10.2f}ms'.format(
+            os.path.basename(filename), 1e3 * t_old, 1e3 * t_new, t_old / t_new,
+            str(sameData(old, new)), 1e3 * t_status))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]), int(sys.argv[2]) if len(sys.argv) > 2 else 0, sys.argv[3:])
+    else:
+        main()
@@ -0,0 +1,92 @@
+"""
+micro benchmark of ExtractPumpProbe.getDataFrame.
+
+A Pump-Probe section in the format of data/gs_631ppGss.out is generated for
+n_pump pumped states and n_probe core excited probe states (as in a cvs
+calculation like data/cvs_cc-pVDZ.out with many states). The section is parsed
+once, then the DataFrame is built `repeat` times with the direct MultiIndex
+construction of getDataFrame and with the former dict of dicts path
+(from_dict, stack, tolist, dropna, swaplevel), which is reimplemented here as
+reference.
+
+usage: python benchmarks/bench_pump_probe.py [n_pump] [n_probe] [repeat]
+
+Author: Tobias Kaczun
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from qextract.extract import ExtractPumpProbe
+
+SEPARATOR = ' ' + 64 * '-'
+
+
+def buildSection(n_pump, n_probe, seed=0):
+    """body of a Pump-Probe section with n_pump * n_probe transitions"""
+    rng = np.random.default_rng(seed)
+    lines = []
+
+    for i in range(n_pump):
+        lines += [SEPARATOR, ' Transitions from pumped state {} (1) A'.format(i + 2), SEPARATOR,
+                  '   probed state    E_pr - E_pu    osc. strength       overlap   ', SEPARATOR]
+        values = rng.normal(size=(n_probe, 3)) * [1.0, 1e-3, 1e-3] + [280.0, 0.0, 0.0]
+        for j, (exc, osc, overlap) in enumerate(values):
+            lines.append('   {:>4d} (1) A  {: .8e} {: .8e} {: .8e}'.format(j + 2, exc, osc, overlap))
+        lines.append(SEPARATOR)
+
+    return '\n'.join(lines) + '\n'
+
+
+def nestedData(exPuP):
+    """the parsed rows in the former {pump: {probe: [values]}} layout"""
+    columns = exPuP.getColumns()
+    data = {}
+    for pump, probe, *values in zip(columns['pump'], columns['probe'], columns['Excitation energy'],
+                                    columns['Osc. strength'], columns['overlap']):
+        data.setdefault(pump, {})[probe] = [float(value) for value in values]
+    return data
+
+
+def legacyDataFrame(data):
+    """the former getDataFrame"""
+    df = pd.DataFrame.from_dict(data).stack().to_frame()
+    df = pd.DataFrame(df[0].values.tolist(), columns=[
+                      'Excitation energy', 'Osc. strength', 'overlap'], index=df.index)
+    df = df.dropna()
+    df = df.swaplevel()
+    return df
+
+
+def bestTime(func, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(n_pump=40, n_probe=400, repeat=10):
+    text = buildSection(n_pump, n_probe)
+
+    start = time.perf_counter()
+    exPuP = ExtractPumpProbe()
+    exPuP.readSection(text)
+    t_parse = time.perf_counter() - start
+
+    t_old, old = bestTime(legacyDataFrame, nestedData(exPuP), repeat)
+    t_new, new = bestTime(ExtractPumpProbe.getDataFrame, exPuP, repeat)
+
+    print('{} pumps x {} probes = {} transitions ({:.1f} MB)'.format(
+        n_pump, n_probe, n_pump * n_probe, len(text) / 2**20))
+    print('readSection          {:>10.2f}ms'.format(1e3 * t_parse))
+    print('dict of dicts/stack  {:>10.2f}ms'.format(1e3 * t_old))
+    print('direct MultiIndex    {:>10.2f}ms  {:.1f}x'.format(1e3 * t_new, t_old / t_new))
+    print('identical: {}'.format(new.equals(old) and new.index.equals(old.index)))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:4]])
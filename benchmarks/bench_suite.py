@@ -0,0 +1,171 @@
+"""
+benchmark suite of the whole pipeline on synthetic outputs.
+
+The outputs are generated with synthetic.py, so the suite does not depend on
+large production data and the sizes can be scaled:
+
+parse       ExtractFile and ScanFile on ADC, CVS-ADC and FANO outputs (files/s,
+            MB/s)
+ingest      TAtoHDF5.createHDF5 of a tree of n_times x n_structures FANO
+            outputs (files/s, MB/s)
+ta          GetTA of the ingested hdf5 File (trajectories/s)
+
+Every case is run `repeat` times and the best time is reported. With --json the
+results are written to a file, which can be passed as --baseline to a later
+run: cases that are more than --tolerance slower than in the baseline are
+reported and the suite exits with status 1.
+
+usage: python benchmarks/bench_suite.py [--times 5] [--structures 20] [--pump 20] [--probe 40]
+                                        [--pad 0] [--workers N] [--repeat 3] [--json OUT]
+                                        [--baseline JSON] [--tolerance 0.2]
+
+Author: Tobias Kaczun
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from qextract.extract import ExtractFile
+from qextract.scan import ScanFile
+from qextract.ta_extract import TAtoHDF5
+from qextract.ta_util import GetTA
+
+import synthetic
+
+
+def bestTime(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def record(seconds, items, nbytes=None):
+    result = {'seconds': seconds, 'items_per_s': items / seconds}
+    if nbytes is not None:
+        result['mb_per_s'] = nbytes / 2**20 / seconds
+    return result
+
+
+def benchParse(directory, args):
+    results = {}
+    for kind in ('adc', 'cvs', 'fano'):
+        files = []
+        nbytes = 0
+        for i in range(args.files):
+            filename = os.path.join(directory, '{}_{}.out'.format(kind, i))
+            nbytes += synthetic.writeOutput(filename, kind=kind, n_states=args.probe, n_pump=args.pump,
+                                            n_probe=args.probe, pad=args.pad, seed=i)
+            files.append(filename)
+
+        for extractor in (ExtractFile(), ScanFile()):
+            seconds = bestTime(lambda: [extractor.extractFile(filename) for filename in files], args.repeat)
+            results['parse.{}.{}'.format(kind, type(extractor).__name__)] = record(seconds, len(files), nbytes)
+
+    return results
+
+
+def benchIngest(directory, args):
+    root = os.path.join(directory, 'tree')
+    nbytes = synthetic.writeTree(root, args.times, args.structures, args.pump, args.probe, args.pad)
+    n_files = args.times * args.structures
+    hdf5_filename = os.path.join(directory, 'ta.hdf5')
+
+    def ingest():
+        if os.path.exists(hdf5_filename):
+            os.remove(hdf5_filename)
+        TAtoHDF5().createHDF5(root, hdf5_filename, workers=args.workers)
+
+    seconds = bestTime(ingest, args.repeat)
+    return {'ingest': record(seconds, n_files, nbytes)}, hdf5_filename
+
+
+def benchTA(hdf5_filename, args):
+    wavelength_arr = np.linspace(270, 300, args.grid)
+    results = {}
+    for use_peak_table in (True, False):
+        seconds = bestTime(lambda: GetTA(hdf5_filename, wavelength_arr, use_peak_table=use_peak_table),
+                           args.repeat)
+        name = 'ta.peak_table' if use_peak_table else 'ta.groups'
+        results[name] = record(seconds, args.structures)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """returns the cases that are slower than (1 + tolerance) x baseline"""
+    regressions = []
+    for name, result in results.items():
+        if name in baseline:
+            ratio = result['seconds'] / baseline[name]['seconds']
+            if ratio > 1 + tolerance:
+                regressions.append((name, ratio))
+    return regressions
+
+
+def printResults(results, baseline=None):
+    print('{:<28} {:>10} {:>12} {:>10} {:>10}'.format('case', 'time', 'items/s', 'MB/s', 'baseline'))
+    for name, result in results.items():
+        ratio = ''
+        if baseline is not None and name in baseline:
+            ratio = '{:.2f}x'.format(baseline[name]['seconds'] / result['seconds'])
+        print('{:<28} {:>9.3f}s {:>12.1f} {:>10} {:>10}'.format(
+            name, result['seconds'], result['items_per_s'],
+            '{:.2f}'.format(result['mb_per_s']) if 'mb_per_s' in result else '-', ratio))
+
+
+def getParser():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--files', type=int, default=5, help='outputs of every kind in the parse cases')
+    parser.add_argument('--times', type=int, default=5, help='time steps of the ingest tree')
+    parser.add_argument('--structures', type=int, default=20, help='structures of the ingest tree')
+    parser.add_argument('--pump', type=int, default=20, help='pumped states of the FANO outputs')
+    parser.add_argument('--probe', type=int, default=40, help='probe states (states of ADC and CVS outputs)')
+    parser.add_argument('--pad', type=int, default=0, help='additional log bytes of every output')
+    parser.add_argument('--grid', type=int, default=1000, help='points of the energy grid of GetTA')
+    parser.add_argument('--workers', type=int, default=None, help='parsing processes of the ingest case')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', default=None, help='write the results to JSON')
+    parser.add_argument('--baseline', default=None, help='JSON of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown (default: 0.2)')
+    return parser
+
+
+def main(argv=None):
+    args = getParser().parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = benchParse(directory, args)
+        ingest_results, hdf5_filename = benchIngest(directory, args)
+        results.update(ingest_results)
+        results.update(benchTA(hdf5_filename, args))
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline) as jsonFile:
+            baseline = json.load(jsonFile)['results']
+
+    printResults(results, baseline)
+
+    if args.json is not None:
+        config = {key: value for key, value in vars(args).items() if key not in ('json', 'baseline')}
+        with open(args.json, 'w') as jsonFile:
+            json.dump({'config': config, 'results': results}, jsonFile, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for name, ratio in regressions:
+            print('regression: {} {:.2f}x slower than baseline'.format(name, ratio))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
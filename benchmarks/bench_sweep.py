@@ -0,0 +1,53 @@
+"""
+broadening width sweep with GetTA.sweep compared to one GetTA per width.
+
+A synthetic tree (see synthetic.py) is ingested, then the TA maps for
+n_widths widths between 0.1 and 1.0 eV are built once by constructing a GetTA
+object per width (every one reads all peaks again) and once with a single
+GetTA(build=False).sweep, which reads the peaks once and reuses the distances
+of the peaks to the grid for all widths.
+
+usage: python benchmarks/bench_sweep.py [n_widths] [n_times] [n_structures]
+
+Author: Tobias Kaczun
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from qextract.ta_extract import TAtoHDF5
+from qextract.ta_util import GetTA
+
+import synthetic
+
+
+def main(n_widths=20, n_times=10, n_structures=50):
+    wavelength_arr = np.linspace(270, 300, 1000)
+    std_devis = np.linspace(0.1, 1.0, n_widths)
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, 'tree')
+        synthetic.writeTree(root, n_times, n_structures, 20, 40)
+        filename = os.path.join(directory, 'ta.hdf5')
+        TAtoHDF5().createHDF5(root, filename)
+
+        for use_peak_table in (True, False):
+            start = time.perf_counter()
+            single = [GetTA(filename, wavelength_arr, std_devi=std_devi, use_peak_table=use_peak_table).ta.ta
+                      for std_devi in std_devis]
+            t_single = time.perf_counter() - start
+
+            start = time.perf_counter()
+            maps = GetTA(filename, wavelength_arr, use_peak_table=use_peak_table, build=False).sweep(std_devis)
+            t_sweep = time.perf_counter() - start
+
+            error = max(np.abs(maps[k] - single[k]).max() / np.abs(single[k]).max() for k in range(n_widths))
+            print('{:<12} {} widths: GetTA per width {:.3f}s  sweep {:.3f}s  {:.1f}x  max rel. difference {:.1e}'.format(
+                'peak table' if use_peak_table else 'groups', n_widths, t_single, t_sweep, t_single / t_sweep, error))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:4]])
@@ -0,0 +1,84 @@
+"""
+time step lookups with the sorted time index compared to the former float16
+parsing of the group names and the linear find_nearest.
+
+An hdf5 File with n_steps time step groups of 0.5 fs is created and
+- the time steps are listed (float16 parsing vs TimeIndex.read),
+- the nearest time step of n_queries times is searched (linear scan per query
+  vs find_nearest per query vs vectorized binary search),
+- a window of 100 time steps is selected.
+
+usage: python benchmarks/bench_timeindex.py [n_steps] [n_queries]
+
+Author: Tobias Kaczun
+"""
+import os
+import sys
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+from qextract import peaktable, timeindex
+from qextract.ta_util import find_nearest
+
+
+def legacyTimes(hdf5File):
+    """the former GetTA._getTime"""
+    sorted_arr = np.fromiter(hdf5File.keys(), dtype=np.float16)
+    return np.sort(sorted_arr).astype(str)
+
+
+def legacyNearest(array, value):
+    """the former find_nearest"""
+    return (np.abs(np.asarray(array) - value)).argmin()
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main(n_steps=20000, n_queries=10000):
+    rng = np.random.default_rng(0)
+    names = ['{:.1f}'.format(0.5 * i) for i in range(n_steps)]
+    queries = rng.uniform(0, 0.5 * n_steps, n_queries)
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'times.hdf5')
+        with h5py.File(filename, 'w') as hdf5File:
+            for name in names:
+                hdf5File.create_group(name)
+        with h5py.File(filename, 'r') as hdf5File, h5py.File(peaktable.indexPath(filename), 'w') as indexFile:
+            timeindex.writeTimeIndex(hdf5File, indexFile)
+            peaktable.stampIndex(indexFile, filename)
+
+        with h5py.File(filename, 'r') as hdf5File:
+            t_legacy, legacy = timed(lambda: legacyTimes(hdf5File))
+            with peaktable.openIndex(filename) as indexFile:
+                t_index, index = timed(lambda: timeindex.TimeIndex.read(hdf5File, indexFile))
+
+    lost = n_steps - len(set(legacy) & set(names))
+    print('{} time steps up to {} fs'.format(n_steps, names[-1]))
+    print('list      float16 {:>9.2f}ms ({} group names not reproduced)  index {:>9.2f}ms'.format(
+        1e3 * t_legacy, lost, 1e3 * t_index))
+
+    values = np.asarray(names, dtype=float)
+    t_legacy, legacy = timed(lambda: [legacyNearest(values, query) for query in queries])
+    t_single, single = timed(lambda: [find_nearest(values, query) for query in queries])
+    t_index, nearest = timed(lambda: timeindex.nearestIndex(index.values, queries))
+    print('nearest   linear  {:>9.2f}ms  find_nearest {:>9.2f}ms  binary search {:>9.2f}ms  {:.0f}x  identical={}'.format(
+        1e3 * t_legacy, 1e3 * t_single, 1e3 * t_index, t_legacy / t_index,
+        np.array_equal(legacy, nearest) and np.array_equal(legacy, single)))
+
+    start = 0.25 * n_steps
+    t_legacy, legacy = timed(lambda: values[(values >= start) & (values <= start + 49.5)])
+    t_index, window = timed(lambda: index.window(start, start + 49.5))
+    print('window    mask    {:>9.3f}ms  binary search {:>9.3f}ms  identical={}'.format(
+        1e3 * t_legacy, 1e3 * t_index, np.array_equal(legacy, window.astype(float))))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,274 @@
+"""
+generator of synthetic qchem outputs and TA directory trees for benchmarks.
+
+The outputs are spliced into the sample outputs in data/ (ADC, CVS-ADC and
+FANO), so everything apart from the generated sections is a real qchem
+output: the $rem section, the 'Excited State Summary' sections and the
+'Pump-Probe Results' are replaced by sections with the requested number of
+states in the format of the samples, and the log between the $rem section and
+the first summary (SCF/Davidson iterations, ...) can be repeated to mimic
+large production outputs.
+
+writeTree creates the layout expected by TAtoHDF5:
+
+root/0.0/Structure0_631ppGss.out
+root/0.0/Structure1_631ppGss.out
+root/2.0/...
+root/Structure0_pop.dat
+root/Structure0_diapop.dat
+
+usage: python benchmarks/synthetic.py ROOT [n_times] [n_structures] [n_pump] [n_probe] [pad]
+
+Author: Tobias Kaczun
+"""
+import os
+import sys
+
+import numpy as np
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+TEMPLATES = {
+    'adc': 'adc2_631G.out',
+    'cvs': 'cvs_cc-pVDZ.out',
+    'fano': 'gs_631ppGss.out',
+}
+METHODS = {
+    'adc': 'adc(2)',
+    'cvs': 'cvs-adc(2)-x',
+    'fano': 'FANO',
+}
+
+SUMMARY_START = 'Excited State Summary'
+SUMMARY_END = 80 * '='
+PUMP_PROBE_START = 'Pump-Probe Results'
+PUMP_PROBE_END = 'End of Pump-Probe Results'
+SEPARATOR = ' ' + 64 * '-' + '\n'
+
+_templates = {}
+
+
+def template(kind):
+    """text of the sample output used for kind ('adc', 'cvs' or 'fano')"""
+    if kind not in _templates:
+        with open(os.path.join(DATA, TEMPLATES[kind])) as outfile:
+            _templates[kind] = outfile.read()
+    return _templates[kind]
+
+
+def bodySpans(text, start_marker, end_marker):
+    """
+    (start, end) of the bodies of all sections, from the line after the line
+    containing start_marker to the line containing end_marker (excluded).
+    """
+    spans = []
+    pos = 0
+
+    while True:
+        index = text.find(start_marker, pos)
+        if index == -1:
+            return spans
+        start = text.find('\n', index) + 1
+        end_match = text.find(end_marker, start)
+        end = text.rfind('\n', start, end_match) + 1
+        spans.append((start, end))
+        pos = text.find('\n', end_match) + 1
+
+
+def remBody(method, n_states, basis='GEN'):
+    lines = ['JOBTYPE         SP', 'METHOD          {}'.format(method), 'basis {}'.format(basis),
+             'PURECART 2', 'cc_symmetry false']
+    if method != 'FANO':
+        lines.append('ee_singlets {}'.format(n_states))
+    lines += ['mem_total 100000', 'threads 12']
+    return ''.join('\t{}\n'.format(line) for line in lines)
+
+
+def excitedState(i, energy, osc, rng):
+    """block of a single excited state as in the 'Excited State Summary'"""
+    dipole = rng.normal(scale=1e-3, size=3)
+    r2 = rng.normal(scale=1e-3, size=3)
+    v1 = rng.uniform(0.7, 0.95)
+    lines = [
+        'Excited state {:>2d} (singlet, A)'.format(i + 1).ljust(65) + '[converged]',
+        76 * '-',
+        'Term symbol:  {} (1) A'.format(i + 2).ljust(56) + 'R^2 = {: .5e}'.format(rng.uniform(1e-13, 1e-7)),
+        '',
+        'Total energy:{:>59.10f} a.u.'.format(-253.0 - rng.uniform(0, 1)),
+        'Excitation energy:{:>57.6f} eV'.format(energy),
+        '',
+        'Osc. strength:{:>61.12f}'.format(osc),
+        'Trans. dip. moment [a.u.]:           [{:>10.6f}, {:>11.6f}, {:>11.6f}]'.format(*dipole),
+        '<i|r^2|0> [a.u.]:                    [{:>10.6f}, {:>11.6f}, {:>11.6f}]'.format(*r2),
+        '',
+        '',
+        'V1^2 = {:.4f}, V2^2 = {:.4f}'.format(v1, 1 - v1),
+        '',
+        'Important amplitudes:',
+        '   occ i       vir a          v   ',
+        '  ' + 36 * '-',
+        '  {:>2d} (A) A     {:>2d} (A) A       {: .4f}'.format(rng.integers(1, 20), rng.integers(20, 60),
+                                                           rng.uniform(-1, 1)),
+        '  ' + 36 * '-',
+        76 * '-',
+        '',
+        '',
+    ]
+    return ''.join('  {}\n'.format(line) if line else '\n' for line in lines)
+
+
+def summaryBody(old_body, energies, oscs, rng):
+    """replaces the excited states of the body of an 'Excited State Summary'"""
+    head = old_body[:old_body.find('  Excited state')]
+    tail = old_body[old_body.rfind('\n' + 80 * '-') + 1:]
+    return head + ''.join(excitedState(i, e, f, rng) for i, (e, f) in enumerate(zip(energies, oscs))) + tail
+
+
+def pumpProbeBody(pump_states, probe_states, values):
+    """body of the 'Pump-Probe Results', values of shape (n_pump, n_probe, 3)"""
+    lines = [80 * '*' + '\n']
+    for i, pump in enumerate(pump_states):
+        lines += [SEPARATOR, ' Transitions from pumped state {}\n'.format(pump), SEPARATOR,
+                  '   probed state    E_pr - E_pu    osc. strength       overlap   \n', SEPARATOR]
+        for probe, (exc, osc, overlap) in zip(probe_states, values[i]):
+            lines.append('{:>15} {: .8e} {: .8e} {: .8e}\n'.format(probe, exc, osc, overlap))
+        lines.append(SEPARATOR)
+    lines.append(80 * '*' + '\n')
+    return ''.join(lines)
+
+
+def generateOutput(kind='fano', n_states=20, n_pump=None, n_probe=None, pad=0, seed=0):
+    """
+    creates the text of a synthetic qchem output.
+
+    Parameters
+    ----------
+    kind : str, optional
+        'adc', 'cvs' or 'fano', by default 'fano'
+    n_states : int, optional
+        number of excited states of 'adc' and 'cvs', by default 20
+    n_pump : int, optional
+        number of pumped (valence) states of 'fano', by default n_states
+    n_probe : int, optional
+        number of probe (core) states of 'fano', by default n_states
+    pad : int, optional
+        approximate number of bytes of additional log before the first
+        summary, by default 0
+    seed : int, optional
+        seed of the random energies and strengths, by default 0
+
+    Returns
+    -------
+    str
+    """
+    rng = np.random.default_rng(seed)
+    text = template(kind)
+    n_pump = n_states if n_pump is None else n_pump
+    n_probe = n_states if n_probe is None else n_probe
+
+    if kind == 'fano':
+        # first summary: core excited (probe) states, second: pumped states
+        core = np.sort(rng.uniform(280, 292, n_probe))
+        valence = np.sort(rng.uniform(4, 11, n_pump))
+        states = [(core, np.abs(rng.normal(scale=1e-4, size=n_probe))),
+                  (valence, np.abs(rng.normal(scale=1e-2, size=n_pump)))]
+    else:
+        energies = np.sort(rng.uniform(280, 292, n_states) if kind == 'cvs' else rng.uniform(4, 11, n_states))
+        states = [(energies, np.abs(rng.normal(scale=1e-2, size=n_states)))]
+
+    replacements = []
+    rem_span = bodySpans(text, '$rem', '$end')[0]
+    replacements.append((rem_span, remBody(METHODS[kind], n_states)))
+
+    summaries = bodySpans(text, SUMMARY_START, SUMMARY_END)
+    for span, (energies, oscs) in zip(summaries, states):
+        replacements.append((span, summaryBody(text[span[0]:span[1]], energies, oscs, rng)))
+
+    if kind == 'fano':
+        span = bodySpans(text, PUMP_PROBE_START, PUMP_PROBE_END)[0]
+        pump_states = ['{} (1) A'.format(i + 2) for i in range(n_pump)]
+        probe_states = ['{} (1) A'.format(i + 2) for i in range(n_probe)]
+        values = np.empty((n_pump, n_probe, 3))
+        values[:, :, 0] = core[None, :] - valence[:, None]
+        values[:, :, 1] = np.abs(rng.normal(scale=1e-4, size=(n_pump, n_probe)))
+        values[:, :, 2] = rng.normal(scale=1e-5, size=(n_pump, n_probe))
+        replacements.append((span, pumpProbeBody(pump_states, probe_states, values)))
+
+    if pad > 0:
+        # repeats the log between the $rem section and the first summary
+        start = text.find('\n', text.find('$end', rem_span[1])) + 1
+        end = text.rfind('\n', 0, text.find(SUMMARY_START)) + 1
+        log = text[start:end]
+        padding = log * (pad // len(log) + 1)
+        padding = padding[:padding.rfind('\n', 0, pad) + 1]
+        replacements.append(((end, end), padding))
+
+    for (start, end), body in sorted(replacements, key=lambda item: item[0], reverse=True):
+        text = text[:start] + body + text[end:]
+
+    return text
+
+
+def writeOutput(filename, **kwargs):
+    """writes generateOutput(**kwargs) to filename and returns its size"""
+    text = generateOutput(**kwargs)
+    with open(filename, 'w') as outfile:
+        outfile.write(text)
+    return len(text)
+
+
+def writeTree(root, n_times=5, n_structures=10, n_pump=20, n_probe=20, pad=0, seed=0):
+    """
+    writes a TA directory tree of FANO outputs with adiabatic and diabatic
+    populations.
+
+    Parameters
+    ----------
+    root : str
+        directory of the tree, created if needed
+    n_times : int, optional
+        number of time steps (0.0, 2.0, ...), by default 5
+    n_structures : int, optional
+        number of structures (trajectories), by default 10
+    n_pump : int, optional
+        number of pumped states, by default 20
+    n_probe : int, optional
+        number of probe states, by default 20
+    pad : int, optional
+        additional log bytes of every output, by default 0
+    seed : int, optional
+        by default 0
+
+    Returns
+    -------
+    int
+        total size of the outputs in bytes
+    """
+    rng = np.random.default_rng(seed)
+    times = [2.0 * t for t in range(n_times)]
+    size = 0
+
+    for t, time in enumerate(times):
+        time_dir = os.path.join(root, '{:.1f}'.format(time))
+        os.makedirs(time_dir, exist_ok=True)
+        for s in range(n_structures):
+            size += writeOutput(os.path.join(time_dir, 'Structure{}_631ppGss.out'.format(s)), kind='fano',
+                                n_pump=n_pump, n_probe=n_probe, pad=pad, seed=seed + t * n_structures + s)
+
+    for s in range(n_structures):
+        with open(os.path.join(root, 'Structure{}_pop.dat'.format(s)), 'w') as popFile, \
+                open(os.path.join(root, 'Structure{}_diapop.dat'.format(s)), 'w') as diapopFile:
+            for time in times:
+                # population index i belongs to the pumped state i + 1
+                pop = np.zeros(n_pump + 1)
+                pop[rng.integers(1, n_pump + 1)] = 1
+                diapop = np.zeros(3)
+                diapop[rng.integers(0, 3)] = 1
+                popFile.write('{:f} {}\n'.format(time, ' '.join(str(x) for x in pop)))
+                diapopFile.write('{:f} {}\n'.format(time, ' '.join(str(x) for x in diapop)))
+
+    return size
+
+
+if __name__ == "__main__":
+    args = [int(x) for x in sys.argv[2:]]
+    print('{:.1f} MB written'.format(writeTree(sys.argv[1], *args) / 2**20))
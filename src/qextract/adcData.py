@@ -8,6 +8,10 @@ import pandas as pd
 
 class adcData:
 
+    # {attribute: loader} of sections that are parsed on first access, set
+    # per instance by setLazy
+    _lazy = {}
+
     def __init__(self, filename):
         self.filename = filename
 
@@ -18,12 +22,54 @@ class adcData:
         else:
             self.__dict__[keys] = dfs
 
+    def setLazy(self, keys, loader):
+        """
+        registers attributes that are only created when first accessed.
+
+        Parameters
+        ----------
+        keys : list(str)
+            names of the attributes
+        loader : callable
+            called with the name of the attribute, returns its value which is
+            then stored as a normal attribute
+        """
+        if '_lazy' not in self.__dict__:
+            self._lazy = {}
+        for key in keys:
+            self._lazy[key] = loader
+
+    def __getattr__(self, name):
+        # only called for attributes that do not exist (yet)
+        lazy = self.__dict__.get('_lazy')
+        if lazy and name in lazy:
+            value = self.__dict__[name] = lazy.pop(name)(name)
+            if not lazy:
+                del self.__dict__['_lazy']
+            return value
+        raise AttributeError(name)
+
+    def load(self):
+        """creates all lazy attributes that have not been accessed yet"""
+        for key in list(self._lazy):
+            getattr(self, key)
+
+    def __getstate__(self):
+        # loaders refer to the file on disk, pickles (cache, worker processes)
+        # contain the parsed data
+        self.load()
+        return self.__dict__
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
     def setOtherAttr(self, *args):
         for obj in args:
             for key in obj.data:
                 self.__dict__[key] = obj.data[key]
 
     def __str__(self):
+        self.load()
         objStr = '==== adcData =====\n'
         # print(self.__dict__)
         for key in self.__dict__:
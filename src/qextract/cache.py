@@ -0,0 +1,207 @@
+"""
+on-disk cache of parsed qchem .out files.
+
+The adcData objects returned by an extractor are pickled into a cache
+directory, keyed by the absolute path, size and modification time of the
+output (or its content hash). Entries are evicted least recently used first
+once the directory exceeds its size limit, the size of the directory is kept
+as a running total so it is only scanned when the limit is exceeded.
+
+Author: Tobias Kaczun
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+
+import pandas as pd
+
+import qextract
+from qextract import extract
+
+# part of every key, so a new cache layout, qextract version (pickled adcData)
+# or pandas version (pickled DataFrames) does not read stale entries
+CACHE_VERSION = '1-qextract{}-pandas{}'.format(qextract.__version__, pd.__version__)
+
+
+class ExtractCache(extract.ExtractFile):
+    """
+    ExtractFile that stores the parsed data on disk and returns it from there
+    as long as the output did not change.
+
+    Parameters
+    ----------
+    cache_dir : str
+        directory of the cache files, created if needed
+    max_size : int, optional
+        maximal size of the cache directory in bytes, by default 1 GiB
+    extractor : ExtractFile, optional
+        extractor used on a cache miss, by default ExtractFile()
+    content_hash : bool, optional
+        key by the sha1 of the content instead of size and modification time,
+        by default False (robust against touched or copied files, but every
+        lookup reads the whole output)
+
+    Attributes
+    ----------
+    hits : int
+        number of extractions served from the cache
+    misses : int
+        number of extractions that had to parse the output
+    """
+
+    suffix = '.pkl'
+    # eviction removes entries down to this fraction of max_size, so the
+    # directory is not scanned again by the next store
+    evict_fraction = 0.9
+
+    def __init__(self, cache_dir, max_size=2**30, extractor=None, content_hash=False):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.extractor = extractor if extractor is not None else extract.ExtractFile()
+        self.content_hash = content_hash
+        self.hits = 0
+        self.misses = 0
+        # running total of the entry sizes, None until the first store
+        self.size = None
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def extractFile(self, filename):
+        """
+        returns the data of filename from the cache or parses and stores it.
+
+        Parameters
+        ----------
+        filename : str
+            path to the qchem .out file
+
+        Returns
+        -------
+        adcData
+        """
+        path = os.path.join(self.cache_dir, self.getKey(filename) + ExtractCache.suffix)
+
+        try:
+            with open(path, 'rb') as cacheFile:
+                data = pickle.load(cacheFile)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # missing, truncated or stale entries (classes that were moved or
+            # removed, ModuleNotFoundError is an ImportError) are misses
+            pass
+        else:
+            # the modification time of an entry is its last use
+            os.utime(path)
+            self.hits += 1
+            return data
+
+        self.misses += 1
+        data = self.extractor.extractFile(filename)
+        self.store(path, data)
+
+        return data
+
+    def getKey(self, filename):
+        """
+        returns the cache key of a file.
+
+        Parameters
+        ----------
+        filename : str
+            path to the qchem .out file
+
+        Returns
+        -------
+        str
+            sha1 of the cache version, absolute path and size/modification
+            time or content of the file
+        """
+        key = hashlib.sha1(CACHE_VERSION.encode())
+        key.update(os.path.abspath(filename).encode())
+
+        if self.content_hash:
+            with open(filename, 'rb') as outfile:
+                for block in iter(lambda: outfile.read(1 << 20), b''):
+                    key.update(block)
+        else:
+            stat = os.stat(filename)
+            key.update('{}:{}'.format(stat.st_size, stat.st_mtime_ns).encode())
+
+        return key.hexdigest()
+
+    def store(self, path, data):
+        """
+        writes an entry (atomically) and evicts old entries if necessary.
+
+        Parameters
+        ----------
+        path : str
+            path of the cache entry
+        data : adcData
+            parsed data
+        """
+        if self.size is None:
+            self.size = self._scanSize()
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as cacheFile:
+                pickle.dump(data, cacheFile, protocol=pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(tmp_path)
+            try:
+                # a broken entry is replaced
+                size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        self.size += size
+        if self.size > self.max_size:
+            self.evict()
+
+    def evict(self, max_size=None):
+        """
+        removes the least recently used entries until the cache is smaller
+        than max_size.
+
+        Parameters
+        ----------
+        max_size : int, optional
+            by default evict_fraction of the max_size of the cache
+        """
+        max_size = self.evict_fraction * self.max_size if max_size is None else max_size
+
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(ExtractCache.suffix):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        # the scan also corrects the running total, e.g. for entries written
+        # by other processes
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        self.size = size
+
+    def _scanSize(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.cache_dir)
+                   if entry.name.endswith(ExtractCache.suffix))
+
+    def clear(self):
+        """removes all entries and resets the counters"""
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(ExtractCache.suffix):
+                os.remove(entry.path)
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
@@ -0,0 +1,285 @@
+"""
+command line interface of qextract.
+
+qextract ingest ROOT HDF5   writes the pump-probe data of all .out files below
+                            ROOT into HDF5 (TAtoHDF5)
+qextract ta HDF5 OUTPUT     builds the TA spectrum of HDF5 (GetTA) and saves it
+                            as compressed .npz, with --all-diabatic together
+                            with the maps of all diabatic states
+
+Both commands print the progress (files or trajectories per second, MB/s,
+ETA) while running and a summary of the time spent in every stage and of the
+files that could not be parsed and of the missing populations or pump states
+at the end. With --profile the detailed
+records of a profiling.Profiler (sub stages and counters, per file) are
+written as JSON.
+
+Author: Tobias Kaczun
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+
+from qextract.profiling import Profiler
+from qextract.ta_extract import TAtoHDF5
+from qextract.ta_util import GetTA
+
+
+class Progress:
+    """
+    prints the progress of a stage, passed as progress to TAtoHDF5.createHDF5
+    or GetTA.
+
+    Parameters
+    ----------
+    label : str
+        name of the stage
+    unit : str, optional
+        name of the items, by default 'files'
+    count_bytes : bool, optional
+        whether the items are paths whose size is added up, by default False
+    stream : file object, optional
+        by default sys.stderr
+    interval : float, optional
+        minimal time in seconds between two status lines, by default 0.2 on a
+        terminal and 5 otherwise
+    quiet : bool, optional
+        only collect the numbers without printing, by default False
+
+    Attributes
+    ----------
+    failures : list(tuple)
+        (item, error) of every failed item
+    """
+
+    def __init__(self, label, unit='files', count_bytes=False, stream=None, interval=None, quiet=False):
+        self.label = label
+        self.unit = unit
+        self.count_bytes = count_bytes
+        self.stream = stream if stream is not None else sys.stderr
+        self.tty = self.stream.isatty()
+        if interval is None:
+            interval = 0.2 if self.tty else 5.0
+        self.interval = interval
+        self.quiet = quiet
+
+        self.total = 0
+        self.done = 0
+        self.nbytes = 0
+        self.failures = []
+        self.start_time = self.last_print = time.perf_counter()
+
+    def start(self, items):
+        self.total = len(items)
+        self.start_time = self.last_print = time.perf_counter()
+        self.show()
+
+    def update(self, item, error=None):
+        self.done += 1
+        if error is not None:
+            self.failures.append((item, error))
+        if self.count_bytes:
+            try:
+                self.nbytes += os.path.getsize(item)
+            except OSError:
+                pass
+
+        now = time.perf_counter()
+        if now - self.last_print >= self.interval or self.done == self.total:
+            self.last_print = now
+            self.show()
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def status(self):
+        """the status line: counts, rates, ETA and number of failures"""
+        elapsed = max(self.elapsed(), 1e-9)
+        rate = self.done / elapsed
+        parts = ['{:<8} [{:>{width}}/{}]'.format(self.label, self.done, self.total, width=len(str(self.total))),
+                 '{:8.1f} {}/s'.format(rate, self.unit)]
+        if self.count_bytes:
+            parts.append('{:8.2f} MB/s'.format(self.nbytes / 2**20 / elapsed))
+        if self.done < self.total and rate > 0:
+            eta = datetime.timedelta(seconds=int((self.total - self.done) / rate))
+        else:
+            eta = '-'
+        parts.append('ETA {}'.format(eta))
+        parts.append('failed {}'.format(len(self.failures)))
+        return '  '.join(parts)
+
+    def show(self):
+        if self.quiet:
+            return
+        if self.tty:
+            self.stream.write('\r' + self.status())
+            if self.done == self.total:
+                self.stream.write('\n')
+        else:
+            self.stream.write(self.status() + '\n')
+        self.stream.flush()
+
+
+def printSummary(timings, progress, stream=None, missing=None):
+    """
+    prints the time of every stage, the failed items and the missing data.
+
+    Parameters
+    ----------
+    timings : dict
+        stage names and times in seconds
+    progress : Progress
+        progress of the main stage
+    stream : file object, optional
+        by default sys.stderr
+    missing : list(tuple), optional
+        (where, what) of data that was expected but not found, e.g.
+        TAtoHDF5.missing or GetTA.missing
+    """
+    stream = stream if stream is not None else sys.stderr
+
+    stream.write('{:<14} {:>10}\n'.format('stage', 'time'))
+    for stage, seconds in timings.items():
+        stream.write('{:<14} {:>9.2f}s\n'.format(stage, seconds))
+    stream.write('{:<14} {:>9.2f}s\n'.format('total', sum(timings.values())))
+
+    ok = progress.done - len(progress.failures)
+    stream.write('{} {}: {} ok, {} failed\n'.format(progress.total, progress.unit, ok, len(progress.failures)))
+    for item, error in progress.failures:
+        stream.write('  {}: {}: {}\n'.format(item, type(error).__name__, error))
+
+    if missing:
+        stream.write('{} missing:\n'.format(len(missing)))
+        for where, what in missing:
+            stream.write('  {}: {}\n'.format(where, what))
+
+
+def writeProfile(profiler, filename):
+    if filename is not None:
+        profiler.toJSON(filename)
+        sys.stderr.write(profiler.summary() + '\n')
+
+
+def ingest(args):
+    progress = Progress('ingest', count_bytes=True, quiet=args.quiet)
+    converter = TAtoHDF5()
+    if args.profile is not None:
+        converter.profiler = Profiler()
+
+    dataset_options = {}
+    if args.dataset_compression != 'none':
+        dataset_options = {'chunks': True, 'compression': args.dataset_compression, 'shuffle': args.shuffle}
+
+    converter.createHDF5(args.root, args.hdf5, adiabatic=not args.no_adiabatic, workers=args.workers,
+                         chunksize=args.chunksize, append=args.append, peak_table=not args.no_peak_table,
+                         compression=None if args.compression == 'none' else args.compression,
+                         progress=progress, skip_errors=not args.strict, layout=args.layout,
+                         dataset_options=dataset_options)
+
+    printSummary(converter.timings, progress, missing=converter.missing)
+    writeProfile(converter.profiler, args.profile)
+    return 1 if progress.failures else 0
+
+
+def ta(args):
+    progress = Progress('ta', unit='trajectories', quiet=args.quiet)
+    profiler = Profiler() if args.profile is not None else None
+    wavelength_arr = np.linspace(args.wavelength[0], args.wavelength[1], int(args.wavelength[2]))
+
+    start = time.perf_counter()
+    getTA = GetTA(args.hdf5, wavelength_arr, time_arr=args.times, time_range=args.time_window,
+                  std_devi=args.std_devi, diabatic_state=args.diabatic_state,
+                  use_peak_table=not args.no_peak_table, chunk_size=args.chunk_size,
+                  tensor_file=args.tensor_file, progress=progress, profiler=profiler,
+                  broadening=args.broadening, workers=args.workers, build=not args.all_diabatic)
+    if args.all_diabatic:
+        decomposition = getTA.diabaticDecomposition()
+        arrays = {'trajectories': np.asarray(getTA.trajectories, dtype=str), 'ta': decomposition.ta,
+                  'states': decomposition.states, 'diabatic': decomposition.maps}
+        decomposition.close()
+    else:
+        arrays = {'trajectories': np.asarray(getTA.ta.z, dtype=str), 'ta': getTA.ta.ta}
+        getTA.ta.close()
+    timings = {'ta': time.perf_counter() - start}
+
+    start = time.perf_counter()
+    np.savez_compressed(args.output, time=getTA.time_arr.astype(float), wavelength=wavelength_arr, **arrays)
+    timings['save'] = time.perf_counter() - start
+
+    printSummary(timings, progress, missing=getTA.missing)
+    writeProfile(profiler, args.profile)
+    return 0
+
+
+def getParser():
+    parser = argparse.ArgumentParser(prog='qextract', description=__doc__.split('\n\n')[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parser_ingest = subparsers.add_parser('ingest', help='write the pump-probe data of .out files to hdf5')
+    parser_ingest.add_argument('root', help='directory containing the time step directories')
+    parser_ingest.add_argument('hdf5', help='hdf5 File to write')
+    parser_ingest.add_argument('-j', '--workers', type=int, default=None,
+                               help='number of parsing processes (default: serial)')
+    parser_ingest.add_argument('--chunksize', type=int, default=1,
+                               help='files sent to a worker process at once (default: 1)')
+    parser_ingest.add_argument('--append', action='store_true',
+                               help='only parse files that are new or changed since the last run')
+    parser_ingest.add_argument('--compression', choices=['gzip', 'lzf', 'none'], default='gzip',
+                               help='compression of the peak table (default: gzip)')
+    parser_ingest.add_argument('--layout', choices=['groups', 'block'], default='groups',
+                               help='a group per pump state or one 2-D dataset per file (default: groups)')
+    parser_ingest.add_argument('--dataset-compression', choices=['gzip', 'lzf', 'none'], default='none',
+                               help='compression of the per file datasets (default: none)')
+    parser_ingest.add_argument('--shuffle', action='store_true',
+                               help='shuffle filter for the compressed per file datasets')
+    parser_ingest.add_argument('--no-adiabatic', action='store_true', help='do not store adiabatic populations')
+    parser_ingest.add_argument('--no-peak-table', action='store_true', help='do not write the peak table')
+    parser_ingest.add_argument('--strict', action='store_true', help='stop at the first file that can not be parsed')
+    parser_ingest.add_argument('--profile', metavar='JSON', default=None,
+                               help='write timings and counters of all stages and files to JSON')
+    parser_ingest.add_argument('-q', '--quiet', action='store_true', help='only print the summary')
+    parser_ingest.set_defaults(func=ingest)
+
+    parser_ta = subparsers.add_parser('ta', help='build the TA spectrum of an hdf5 File')
+    parser_ta.add_argument('hdf5', help='hdf5 File written by ingest')
+    parser_ta.add_argument('output', help='.npz File for time, wavelength, trajectories and ta')
+    parser_ta.add_argument('-w', '--wavelength', type=float, nargs=3, required=True,
+                           metavar=('START', 'STOP', 'NUM'), help='energy grid (as numpy.linspace)')
+    parser_ta.add_argument('--std-devi', type=float, default=0.4,
+                           help='full width at half maximum of the lorentzians (default: 0.4)')
+    parser_ta.add_argument('-t', '--times', type=float, nargs='+', default=None,
+                           help='time steps (default: all in the hdf5 File)')
+    parser_ta.add_argument('--time-window', type=float, nargs=2, default=None, metavar=('START', 'STOP'),
+                           help='all time steps with START <= time <= STOP')
+    parser_ta.add_argument('--diabatic-state', type=int, default=None,
+                           help='only structures in this diabatic state')
+    parser_ta.add_argument('--all-diabatic', action='store_true',
+                           help='also save the maps of all diabatic states (states, diabatic) in one pass')
+    parser_ta.add_argument('-j', '--workers', type=int, default=None,
+                           help='number of processes the trajectories are distributed to (default: serial)')
+    parser_ta.add_argument('--chunk-size', type=int, default=None,
+                           help='trajectories processed at once (streaming mode)')
+    parser_ta.add_argument('--tensor-file', default=None,
+                           help='hdf5 File the per trajectory tensor is written to (streaming mode)')
+    parser_ta.add_argument('--broadening', choices=['direct', 'fft'], default='direct',
+                           help='lorentzian broadening, fft requires a uniform grid (default: direct)')
+    parser_ta.add_argument('--no-peak-table', action='store_true', help='read the nested groups instead')
+    parser_ta.add_argument('--profile', metavar='JSON', default=None,
+                           help='write timings and counters of all stages and trajectories to JSON')
+    parser_ta.add_argument('-q', '--quiet', action='store_true', help='only print the summary')
+    parser_ta.set_defaults(func=ta)
+
+    return parser
+
+
+def main(argv=None):
+    args = getParser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,12 +2,19 @@
 
 Author: Tobias Kaczun
 """
+import copy
 import glob
 import os
+import re
 import numpy as np
+
+from array import array
 import pandas as pd
 
-from qextract import adcData
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor,
+                                FIRST_COMPLETED, wait)
+
+from qextract import adcData, profiling
 
 
 class NotEndOfCalcError(Exception):
@@ -42,6 +49,11 @@ class Extract:
     def getData(line):
         pass
 
+    def encode(self, column, value):
+        """returns the integer code of value in one of the coded columns"""
+        codes = self.codes[column]
+        return codes.setdefault(value, len(codes))
+
 
 # TODO: Update docstrings!
 class ExtractRem(Extract):
@@ -112,6 +124,22 @@ class ExtractRem(Extract):
         line = line.lstrip().rstrip()
         self.data[line.split()[0].upper()] = line.split()[-1]
 
+    def readSection(self, text):
+        """
+        Extracts the data of a complete $rem section at once.
+
+        Every line is split only once, empty lines are skipped.
+
+        Parameters
+        ----------
+        text : str
+                body of the $rem section without the $rem and $end lines
+        """
+        for line in text.splitlines():
+            split = line.split()
+            if split:
+                self.data[split[0].upper()] = split[-1]
+
     def getBASISfromFN(self, filename):
         """[summary]
 
@@ -120,6 +148,7 @@ class ExtractRem(Extract):
         filename : [type]
             [description]
         """
+        filename = os.path.basename(filename)
         basis = filename.split('_')[-1].split('.')[0]
 
         old_char = ['p', 's']
@@ -173,17 +202,29 @@ class ExtractExcitation(Extract):
     osc_strength_match = 'Osc. strength:'
     term_match = 'Term symbol:'
 
+    # matches only the lines of interest, everything in between (amplitudes,
+    # dipole moments, ...) is skipped by the regex engine. Matching on the
+    # newline instead of ^ with re.MULTILINE is considerably faster.
+    line_match = re.compile(r'\n[ \t]*({}|{}|{}|{})(.*)'.format(
+        re.escape(mult_conv_match), re.escape(term_match),
+        re.escape(exc_energy_match), re.escape(osc_strength_match)))
+
+    # columns stored as integer codes into the values seen so far
+    coded = ('multiplicity', 'symmetry')
+
     def __init__(self):
         Extract.__init__(self)
+        # numbers go into typed buffers instead of lists of python objects
         self.data = {
-            'Excitation energy': [],
-            'Osc. strength': [],
-            'converged': [],
-            'multiplicity': [],
+            'Excitation energy': array('d'),
+            'Osc. strength': array('d'),
+            'converged': array('b'),
+            'multiplicity': array('i'),
             'term': [],
-            'symmetry': [],
+            'symmetry': array('i'),
             'state': [],
         }
+        self.codes = {column: {} for column in ExtractExcitation.coded}
 
     def readLine(self, line):
         """
@@ -221,8 +262,8 @@ class ExtractExcitation(Extract):
         """
         if ExtractExcitation.mult_conv_match in line:
             # removes special charackters such as , ( ... from line split for multiplicity
-            self.data['multiplicity'].append(
-                ''.join(filter(str.isalnum, line.split()[3])))
+            self.data['multiplicity'].append(self.encode(
+                'multiplicity', ''.join(filter(str.isalnum, line.split()[3]))))
             if '[converged]' in line.split()[-1]:
                 self.data['converged'].append(True)
             else:
@@ -230,7 +271,7 @@ class ExtractExcitation(Extract):
 
         if ExtractExcitation.term_match in line:
             split = line.split()[2:5]
-            self.data['symmetry'].append(split[-1])
+            self.data['symmetry'].append(self.encode('symmetry', split[-1]))
             self.data['state'].append(split[0])
             self.data['term'].append(' '.join(split))
         if ExtractExcitation.exc_energy_match in line:
@@ -240,6 +281,65 @@ class ExtractExcitation(Extract):
         if ExtractExcitation.osc_strength_match in line:
             self.data['Osc. strength'][-1] = float(line.split()[-1])
 
+    def readSection(self, text):
+        """
+        Extracts the data of a complete excitation section at once.
+
+        Only the lines starting with one of the patterns are visited and the
+        remainder of the line after the pattern is split only once.
+
+        Parameters
+        ----------
+        text : str
+                body of the excitation section between its start and end line
+        """
+        data = self.data
+
+        for match in ExtractExcitation.line_match.finditer('\n' + text):
+            pattern = match.group(1)
+            split = match.group(2).split()
+
+            if pattern == ExtractExcitation.mult_conv_match:
+                data['multiplicity'].append(self.encode('multiplicity', ''.join(filter(str.isalnum, split[1]))))
+                data['converged'].append('[converged]' in split[-1])
+            elif pattern == ExtractExcitation.term_match:
+                data['symmetry'].append(self.encode('symmetry', split[2]))
+                data['state'].append(split[0])
+                data['term'].append(' '.join(split[:3]))
+            elif pattern == ExtractExcitation.exc_energy_match:
+                data['Excitation energy'].append(float(split[-2]))
+                data['Osc. strength'].append(np.nan)
+            else:
+                data['Osc. strength'][-1] = float(split[-1])
+
+    def getColumns(self):
+        """
+        converts the buffers into numpy arrays.
+
+        The float buffers are wrapped without a copy, the coded columns are
+        decoded into arrays of strings.
+
+        Returns
+        -------
+        dict
+            one array per column, in the order of data
+        """
+        columns = {}
+
+        for key, values in self.data.items():
+            if key in ExtractExcitation.coded:
+                names = np.empty(len(self.codes[key]), dtype=object)
+                names[:] = list(self.codes[key])
+                columns[key] = names[np.frombuffer(values, dtype=np.intc)]
+            elif key == 'converged':
+                columns[key] = np.frombuffer(values, dtype=np.int8).astype(bool)
+            elif isinstance(values, array):
+                columns[key] = np.frombuffer(values, dtype=np.float64)
+            else:
+                columns[key] = np.asarray(values, dtype=object)
+
+        return columns
+
     def getDataFrame(self):
         """[summary]
 
@@ -248,7 +348,7 @@ class ExtractExcitation(Extract):
         [type]
             [description]
         """
-        df = pd.DataFrame.from_dict(self.data)
+        df = pd.DataFrame(self.getColumns())
         df = df.set_index('term')
         return df
 
@@ -271,10 +371,23 @@ class ExtractPumpProbe(Extract):
 
     state_start = 'Transitions from pumped state'
 
+    value_columns = ('Excitation energy', 'Osc. strength', 'overlap')
+
     def __init__(self):
         Extract.__init__(self)
-        self.data = {}
+        # one entry per probe line, pump and probe states as integer codes
+        self.data = {
+            'pump': array('i'),
+            'probe': array('i'),
+            'Excitation energy': array('d'),
+            'Osc. strength': array('d'),
+            'overlap': array('d'),
+        }
+        self.codes = {'pump': {}, 'probe': {}}
+        # first row of the latest header of every pump (by code)
+        self.pump_start = []
         self.cur_pump_key = None
+        self.cur_pump = None
 
     def readLine(self, line):
         """[summary]
@@ -299,16 +412,147 @@ class ExtractPumpProbe(Extract):
             [description]
         """
         if ExtractPumpProbe.state_start in line:
-            self.cur_pump_key = line.split(maxsplit=4)[-1].rstrip('\n')
-            self.data[self.cur_pump_key] = {}
+            self.setPump(line.split(maxsplit=4)[-1].rstrip('\n'))
         else:
             try:
-                probe_state = ' '.join(line.split()[:3])
-                probe_values = [float(x) for x in line.split()[3:]]
-                self.data[self.cur_pump_key][probe_state] = probe_values
+                split = line.split()
+                probe_values = [float(x) for x in split[3:]]
+                if self.cur_pump is None:
+                    raise KeyError(line)
+                self.appendRow(' '.join(split[:3]), probe_values)
             except (ValueError, KeyError):
                 self.checkEnd(line)
 
+    def setPump(self, pump):
+        """
+        starts the rows of a pumped state, rows of an earlier header of the
+        same state are discarded.
+
+        Parameters
+        ----------
+        pump : str
+            name of the pumped state
+        """
+        self.cur_pump_key = pump
+        self.cur_pump = self.encode('pump', pump)
+        if self.cur_pump == len(self.pump_start):
+            self.pump_start.append(0)
+        self.pump_start[self.cur_pump] = len(self.data['pump'])
+
+    def appendRow(self, probe, values):
+        """
+        appends a probe state of the current pump, lines without exactly three
+        values are kept as NaN.
+
+        Parameters
+        ----------
+        probe : str
+            name of the probe state
+        values : list(float)
+            excitation energy, oscillator strength and overlap
+        """
+        if len(values) != 3:
+            values = [np.nan] * 3
+        data = self.data
+        data['pump'].append(self.cur_pump)
+        data['probe'].append(self.encode('probe', probe))
+        data['Excitation energy'].append(values[0])
+        data['Osc. strength'].append(values[1])
+        data['overlap'].append(values[2])
+
+    def readSection(self, text):
+        """
+        Extracts the data of a complete Pump-Probe section at once.
+
+        Every line is split only once, lines that are not a pumped state
+        header or a probe state with its three values are skipped.
+
+        Parameters
+        ----------
+        text : str
+            body of the Pump-Probe section between its start and end line
+        """
+        data = self.data
+        pump_append, probe_append = data['pump'].append, data['probe'].append
+        exc_append, osc_append, overlap_append = (data[key].append for key in ExtractPumpProbe.value_columns)
+        probe_codes = self.codes['probe']
+
+        for line in text.splitlines():
+            split = line.split()
+            if len(split) == 6 and self.cur_pump is not None:
+                try:
+                    exc, osc, overlap = float(split[3]), float(split[4]), float(split[5])
+                except ValueError:
+                    continue
+                pump_append(self.cur_pump)
+                probe_append(probe_codes.setdefault(' '.join(split[:3]), len(probe_codes)))
+                exc_append(exc)
+                osc_append(osc)
+                overlap_append(overlap)
+            elif split[:4] == ['Transitions', 'from', 'pumped', 'state']:
+                self.setPump(line.split(maxsplit=4)[-1])
+
+    def uniqueRows(self):
+        """
+        resolves repeated pumped states and probe states.
+
+        Returns
+        -------
+        key_rows : np.ndarray
+            row of the first occurrence of every (pump, probe) pair, ordered
+            by pump and then by the order in the file
+        value_rows : np.ndarray
+            row of the last occurrence of the same pairs (whose values count)
+        """
+        pump = np.frombuffer(self.data['pump'], dtype=np.intc)
+        probe = np.frombuffer(self.data['probe'], dtype=np.intc)
+
+        rows = np.arange(pump.shape[0])
+        rows = rows[rows >= np.asarray(self.pump_start, dtype=np.int64)[pump]]
+        rows = rows[np.argsort(pump[rows], kind='stable')]
+
+        key = pump[rows].astype(np.int64) * len(self.codes['probe']) + probe[rows]
+        _, first = np.unique(key, return_index=True)
+        _, last = np.unique(key[::-1], return_index=True)
+        last = key.shape[0] - 1 - last
+
+        order = np.argsort(first)
+        return rows[first[order]], rows[last[order]]
+
+    def _names(self, column):
+        names = np.empty(len(self.codes[column]), dtype=object)
+        names[:] = list(self.codes[column])
+        return names
+
+    def _values(self, rows):
+        return np.column_stack([np.frombuffer(self.data[key], dtype=np.float64)[rows]
+                                for key in ExtractPumpProbe.value_columns])
+
+    def getColumns(self):
+        """
+        flattens the data into one array per column.
+
+        Returns
+        -------
+        dict
+            'pump', 'probe', 'Excitation energy', 'Osc. strength' and 'overlap'
+            arrays, one entry per (pump, probe) pair ordered by pump, rows with
+            missing values are dropped
+        """
+        key_rows, value_rows = self.uniqueRows()
+        values = self._values(value_rows)
+        valid = ~np.isnan(values).any(axis=1)
+        key_rows = key_rows[valid]
+
+        columns = {
+            'pump': self._names('pump')[np.frombuffer(self.data['pump'], dtype=np.intc)[key_rows]],
+            'probe': self._names('probe')[np.frombuffer(self.data['probe'], dtype=np.intc)[key_rows]],
+        }
+        for i, key in enumerate(ExtractPumpProbe.value_columns):
+            columns[key] = values[valid, i]
+
+        return columns
+
     def getDataFrame(self):
         """[summary]
 
@@ -317,12 +561,25 @@ class ExtractPumpProbe(Extract):
         [type]
             [description]
         """
-        df = pd.DataFrame.from_dict(self.data).stack().to_frame()
-        df = pd.DataFrame(df[0].values.tolist(), columns=[
-                          'Excitation energy', 'Osc. strength', 'overlap'], index=df.index)
-        df = df.dropna()
-        df = df.swaplevel()
-        return df
+        key_rows, value_rows = self.uniqueRows()
+        pump = np.frombuffer(self.data['pump'], dtype=np.intc)[key_rows]
+        probe = np.frombuffer(self.data['probe'], dtype=np.intc)[key_rows]
+
+        # rows are ordered by probe state (in the order they first appear
+        # when going through the pumped states) and then by pumped state
+        _, first, inverse = np.unique(probe, return_index=True, return_inverse=True)
+        rank = np.argsort(np.argsort(first))[inverse]
+        order = np.lexsort((pump, rank))
+
+        values = self._values(value_rows[order])
+        valid = ~np.isnan(values).any(axis=1)
+        order = order[valid]
+
+        # the codes already are a factorization of the names, so the index is
+        # built directly from them instead of hashing the strings again
+        index = pd.MultiIndex(levels=[pd.Index(self._names('pump')), pd.Index(self._names('probe'))],
+                              codes=[pump[order], probe[order]], verify_integrity=False)
+        return pd.DataFrame(values[valid], index=index, columns=list(ExtractPumpProbe.value_columns))
 
 
 class ExtractOther(Extract):
@@ -353,11 +610,7 @@ class ExtractOther(Extract):
             [description]
         """
         if ExtractOther.cpu_time_match in line:
-            try:
-                self.data['cpu'].append(
-                    float(line.split()[-1].split('(')[0][:-1]))
-            except (TypeError, ValueError):
-                self.data['cpu'].append(np.nan)
+            self.readCpu(line)
 
         if ExtractOther.end_match in line:
             self.data['success'] = True
@@ -368,6 +621,21 @@ class ExtractOther(Extract):
                 raise NotEndOfCalcError(
                     'File continues with additional calculation')
 
+    def readCpu(self, line):
+        """
+        Extracts the cpu time from the 'Total job time:' line.
+
+        Parameters
+        ----------
+        line : str
+            line containing the cpu_time_match
+        """
+        try:
+            self.data['cpu'].append(
+                float(line.split()[-1].split('(')[0][:-1]))
+        except (TypeError, ValueError):
+            self.data['cpu'].append(np.nan)
+
 # TODO: Write docstrings
 # TODO: rewrite to staticmethods? or other direct call?
 class ExtractFile:
@@ -375,6 +643,10 @@ class ExtractFile:
 
     """
 
+    # replaced by a profiling.Profiler to record the time of the stages and
+    # the bytes, lines and peaks of every file
+    profiler = profiling.NULL
+
     def extractFile(self, filename):
         """[summary]
 
@@ -389,53 +661,127 @@ class ExtractFile:
             [description]
         """
 
-        with open(filename, 'r') as outfile:
+        with open(filename, 'r') as outfile, self.profiler.stage('extract.file', file=filename):
+
+            if self.profiler.enabled:
+                outfile = _LineCounter(outfile)
 
             cur_data = self.extractJob(outfile, filename)
 
+            if self.profiler.enabled:
+                self.profiler.count('lines', outfile.lines, file=filename)
+                self.profileData(cur_data, filename, os.path.getsize(filename))
+
             return cur_data
 
+    def profileData(self, cur_data, filename, nbytes):
+        """
+        counts the bytes read and the peaks (rows of the parsed sections) of
+        a file, sections that have not been parsed yet (lazy) are not counted.
+
+        Parameters
+        ----------
+        cur_data : adcData
+            parsed data of the file
+        filename : str
+            path to the qchem .out file
+        nbytes : int
+            number of bytes read
+        """
+        self.profiler.count('bytes', nbytes, file=filename)
+        for key in ('adc', 'pump', 'probe', 'pump_probe'):
+            if key in cur_data.__dict__:
+                self.profiler.count('peaks', len(cur_data.__dict__[key]), file=filename)
+
     def extractJob(self, outfile, filename):
-        """[summary]
+        """
+        parses all jobs remaining in the file and returns the last one.
 
         Parameters
         ----------
-        outfile : [type]
-            [description]
-        filename : [type]
-            [description]
+        outfile : file object
+            opened qchem .out file
+        filename : str
+            name of the file, stored in the adcData object
 
         Returns
         -------
-        [type]
-            [description]
+        adcData
+            data of the last job
         """
+        for cur_data in self.iterJobs(outfile, filename):
+            pass
 
-        cur_data = adcData.adcData(filename)
+        return cur_data
 
-        exRem = self.extractREM(outfile)
-        exOth = ExtractOther()
+    def extractJobs(self, filename):
+        """
+        parses every job of a file containing several (chained) jobs.
 
-        if exRem.data['BASIS'].casefold() == 'gen':
-            exRem. getBASISfromFN(filename)
-        if 'FANO'.casefold() in exRem.data['METHOD'].casefold():
-            cur_data.setData(['pump', 'probe', 'pump_probe'],
-                             self.extractFANO(outfile))
-        elif 'adc' in exRem.data['METHOD'].casefold():
-            cur_data.setData('adc', self.extractADC(outfile))
-        else:
-            # This has to be rewritten
-            pass
+        Parameters
+        ----------
+        filename : str
+            path to the qchem .out file
 
-        try:
-            for line in outfile:
-                exOth.readLine(line)
-        except NotEndOfCalcError:
-            cur_data = self.extractJob(outfile, filename)
+        Returns
+        -------
+        list(adcData)
+            one adcData per job in the order of the file
+        """
+        with open(filename, 'r') as outfile:
+            return list(self.iterJobs(outfile, filename))
+
+    def iterJobs(self, outfile, filename):
+        """
+        generator yielding one adcData per job in a single pass over the file.
 
-        cur_data.setOtherAttr(exRem, exOth)
+        A job ends at the 'User input:' line following a successful
+        calculation, the next job is parsed from there on.
 
-        return cur_data
+        Parameters
+        ----------
+        outfile : file object
+            opened qchem .out file
+        filename : str
+            name of the file, stored in the adcData objects
+
+        Yields
+        ------
+        adcData
+            data of a job
+        """
+        finished = False
+
+        while not finished:
+            cur_data = adcData.adcData(filename)
+
+            with self.profiler.stage('extract.rem'):
+                exRem = self.extractREM(outfile)
+            exOth = ExtractOther()
+
+            with self.profiler.stage('extract.sections'):
+                if exRem.data['BASIS'].casefold() == 'gen':
+                    exRem. getBASISfromFN(filename)
+                if 'FANO'.casefold() in exRem.data['METHOD'].casefold():
+                    cur_data.setData(['pump', 'probe', 'pump_probe'],
+                                     self.extractFANO(outfile))
+                elif 'adc' in exRem.data['METHOD'].casefold():
+                    cur_data.setData('adc', self.extractADC(outfile))
+                else:
+                    # This has to be rewritten
+                    pass
+
+            try:
+                with self.profiler.stage('extract.other'):
+                    for line in outfile:
+                        exOth.readLine(line)
+                finished = True
+            except NotEndOfCalcError:
+                pass
+
+            cur_data.setOtherAttr(exRem, exOth)
+
+            yield cur_data
 
     def extractREM(self, outfile):
         """[summary]
@@ -491,7 +837,8 @@ class ExtractFile:
             else:
                 break
 
-        return exCVS.getDataFrame(), exADC.getDataFrame(), exPuP.getDataFrame()
+        with self.profiler.stage('extract.dataframe'):
+            return exCVS.getDataFrame(), exADC.getDataFrame(), exPuP.getDataFrame()
 
     def extractADC(self, outfile):
         """[summary]
@@ -515,36 +862,143 @@ class ExtractFile:
             else:
                 break
 
-        return exADC.getDataFrame()
+        with self.profiler.stage('extract.dataframe'):
+            return exADC.getDataFrame()
 
-    def extractFolder(self, dirPath, pattern='*.out'):
-        """[summary]
+    def extractFolder(self, dirPath, pattern='*.out', workers=None, executor='thread', verbose=True):
+        """
+        extracts all files in a directory matching pattern.
 
         Parameters
         ----------
-        dirPath : [type]
-            [description]
+        dirPath : str
+            path to the directory, the current working directory is not changed
         pattern : str, optional
-            [description], by default '*.out'
+            glob pattern relative to dirPath, by default '*.out'
+        workers : int, optional
+            number of threads/processes used for parsing, by default None (serial)
+        executor : str, optional
+            'thread' or 'process', by default 'thread'
+        verbose : bool, optional
+            print the files being extracted, by default True
 
         Returns
         -------
-        [type]
-            [description]
+        dict
+            filenames (relative to dirPath) as keys and adcData as values
         """
 
         folder_data = {}
 
-        os.chdir(dirPath)
-        for filename in glob.glob(pattern):
-            try:
-                print('extracting: {} ...'.format(filename))
-                folder_data[filename] = self.extractFile(filename)
-            except (KeyError):
-                print('Extraction of {} failed'.format(filename))
+        for filename, data in self.iterFolder(dirPath, pattern, workers=workers,
+                                              executor=executor, verbose=verbose):
+            folder_data[filename] = data
 
         return folder_data
 
+    def iterFolder(self, dirPath, pattern='*.out', workers=None, executor='thread', verbose=False):
+        """
+        generator yielding (filename, adcData) as soon as a file is extracted.
+
+        In parallel mode at most 2 * workers files are in flight, so the memory
+        is bounded independently of the number of files. The order of the
+        files is the sorted order in serial mode and the order of completion
+        otherwise. Files whose extraction fails are skipped.
+
+        Parameters
+        ----------
+        dirPath : str
+            path to the directory, the current working directory is not changed
+        pattern : str, optional
+            glob pattern relative to dirPath, by default '*.out'
+        workers : int, optional
+            number of threads/processes used for parsing, by default None (serial)
+        executor : str, optional
+            'thread' or 'process', by default 'thread'
+        verbose : bool, optional
+            print the files being extracted, by default False
+
+        Yields
+        ------
+        filename : str
+            path relative to dirPath
+        data : adcData
+        """
+        paths = sorted(glob.glob(os.path.join(glob.escape(dirPath), pattern)))
+
+        if workers is None or workers <= 1:
+            for path in paths:
+                if verbose:
+                    print('extracting: {} ...'.format(os.path.relpath(path, dirPath)))
+                result = _extractSafe(self, path)
+                if self._checkResult(result, dirPath):
+                    yield os.path.relpath(path, dirPath), result[1]
+            return
+
+        Executor = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}[executor]
+
+        worker = self
+        if executor == 'process' and self.profiler.enabled:
+            # every task gets a copy with an empty profiler, whose records are
+            # sent back and merged
+            worker = copy.copy(self)
+            worker.profiler = profiling.Profiler()
+
+        with Executor(max_workers=workers) as pool:
+            remaining = iter(paths)
+            pending = set()
+
+            while True:
+                for path in remaining:
+                    if verbose:
+                        print('extracting: {} ...'.format(os.path.relpath(path, dirPath)))
+                    pending.add(pool.submit(_extractSafe, worker, path))
+                    if len(pending) >= 2 * workers:
+                        break
+
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if worker is not self:
+                        self.profiler.merge(result[2])
+                    if self._checkResult(result, dirPath):
+                        yield os.path.relpath(result[0], dirPath), result[1]
+
+    def _checkResult(self, result, dirPath):
+        if result[1] is None:
+            print('Extraction of {} failed'.format(os.path.relpath(result[0], dirPath)))
+            return False
+        return True
+
+
+class _LineCounter:
+    # iterator over the lines of a file that counts them (profiling only)
+
+    def __init__(self, outfile):
+        self.outfile = outfile
+        self.lines = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self.outfile)
+        self.lines += 1
+        return line
+
+
+def _extractSafe(extractor, path):
+    # module level so it can be sent to worker processes, the profiler is
+    # returned for the records of worker processes
+    profiler = extractor.profiler if extractor.profiler.enabled else None
+    try:
+        return path, extractor.extractFile(path), profiler
+    except (KeyError):
+        return path, None, profiler
+
 
 if __name__ == "__main__":
     filepath = '/export/home/ccprak10/scripts/qextract/data/'
@@ -0,0 +1,441 @@
+"""
+consolidated, columnar table of all pump-probe peaks in an hdf5 File written
+by TAtoHDF5.
+
+The nested groups (time/structure/pump/'exc_energy') contain many tiny
+datasets, reading them one by one is what dominates building a TA tensor. The
+peak table stores the same data as a few chunked and compressed columns.
+
+The top level of the hdf5 File only holds the time step groups, which readers
+list and parse as numbers. The peak table (and the time index, see the
+timeindex module) is therefore written to a separate index File next to it
+('ta.hdf5' -> 'ta.index.hdf5', see indexPath). The index File carries size and
+modification time of the hdf5 File it was written for and is ignored as soon
+as the hdf5 File has changed (see openIndex):
+
+/ (root of the index File)
+|---peak_table/
+|   |---'times'         (n_time,)             group names of the time steps, sorted by value
+|   |---'trajectories'  (n_traj,)             group names of the structures (trajectories)
+|   |---'pumps'         (n_pump,)             names of the pump states ('2_(1)_A')
+|   |---'probes'        (n_probe,)            names of the probe states ('2 (1) A')
+|   |---'time'          (n_rows,)             index into 'times'
+|   |---'trajectory'    (n_rows,)             index into 'trajectories'
+|   |---'pump'          (n_rows,)             index into 'pumps'
+|   |---'probe'         (n_rows,)             index into 'probes', -1 if unknown
+|   |---'exc_energy'    (n_rows,)
+|   |---'osc_strength'  (n_rows,)
+|   |---'overlap'       (n_rows,)             NaN if unknown
+|   |---'offsets'       (n_time * n_traj + 1,) rows of (t, j) are offsets[k]:offsets[k+1], k = t * n_traj + j
+|   |---'present'       (n_time, n_traj)      whether the structure group exists
+|   |---'pop'           (n_time, n_traj, n_states) NaN padded
+|   |---'diapop'        (n_time, n_traj, n_diabatic) NaN padded
+
+The rows are sorted by time and trajectory, within a structure they keep the
+order of the nested groups.
+
+Instead of a group per pump state a structure may hold all its peaks in a
+single 2-D dataset (block layout of TAtoHDF5):
+
+time/structure/'peaks'  (n_rows, 3)   columns exc_energy, osc_strength, overlap
+    attrs 'pumps'         names of the pump states
+    attrs 'pump_offsets'  rows of pump p are pump_offsets[p]:pump_offsets[p + 1]
+
+Author: Tobias Kaczun
+"""
+import contextlib
+import os
+
+import h5py
+import numpy as np
+
+from qextract import timeindex
+
+GROUP = 'peak_table'
+VERSION = 1
+# inserted before the extension of the hdf5 File to get its index File
+INDEX_SUFFIX = '.index'
+
+COLUMNS = ('exc_energy', 'osc_strength', 'overlap')
+POPULATIONS = ('pop', 'diapop')
+# 2-D dataset of a structure in the block layout
+BLOCK = 'peaks'
+
+
+def indexPath(filename):
+    """path of the index File belonging to the hdf5 File filename"""
+    root, ext = os.path.splitext(filename)
+    return root + INDEX_SUFFIX + ext
+
+
+def stampIndex(indexFile, filename):
+    """
+    stores size and modification time of the (closed) hdf5 File filename in
+    its index File.
+
+    Parameters
+    ----------
+    indexFile : h5py File object
+        index File opened for writing
+    filename : str
+        path of the hdf5 File
+    """
+    stat = os.stat(filename)
+    indexFile.attrs['source_size'] = stat.st_size
+    indexFile.attrs['source_mtime_ns'] = stat.st_mtime_ns
+
+
+def isCurrent(indexFile, filename):
+    """whether the index File was written for the current state of filename"""
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return False
+    return (indexFile.attrs.get('source_size') == stat.st_size
+            and indexFile.attrs.get('source_mtime_ns') == stat.st_mtime_ns)
+
+
+@contextlib.contextmanager
+def openIndex(filename):
+    """
+    opens the index File of an hdf5 File read only.
+
+    Parameters
+    ----------
+    filename : str
+        path of the hdf5 File
+
+    Yields
+    ------
+    h5py File object or None
+        None if there is no index File or the hdf5 File has changed since
+        the index File was written
+    """
+    path = indexPath(filename)
+    if not os.path.exists(path):
+        yield None
+        return
+
+    with h5py.File(path, 'r') as indexFile:
+        yield indexFile if isCurrent(indexFile, filename) else None
+
+
+def peakBlock(pump_names, exc_energy, osc_strength, overlap=None, probe_names=None):
+    """
+    creates the block of rows belonging to a single structure.
+
+    Parameters
+    ----------
+    pump_names : array_like
+        pump state of every row
+    exc_energy : array_like
+        excitation energies
+    osc_strength : array_like
+        oscillator strengths
+    overlap : array_like, optional
+        overlaps, by default NaN
+    probe_names : array_like, optional
+        probe state of every row, by default unknown
+
+    Returns
+    -------
+    dict
+        the columns of the block
+    """
+    exc_energy = np.asarray(exc_energy, dtype=np.float64)
+    n = exc_energy.shape[0]
+
+    return {
+        'pump': np.asarray(pump_names, dtype=object),
+        'probe': np.asarray(probe_names if probe_names is not None else [None] * n, dtype=object),
+        'exc_energy': exc_energy,
+        'osc_strength': np.asarray(osc_strength, dtype=np.float64),
+        'overlap': np.asarray(overlap if overlap is not None else np.full(n, np.nan), dtype=np.float64),
+    }
+
+
+def readBlockDataset(structurGroup):
+    """
+    reads the 2-D peak dataset of a structure written in the block layout.
+
+    Parameters
+    ----------
+    structurGroup : h5py Group
+        group of the structure (time/structure)
+
+    Returns
+    -------
+    pump_names : numpy.ndarray
+        names of the pump states
+    pump_offsets : numpy.ndarray
+        rows of pump p are pump_offsets[p]:pump_offsets[p + 1]
+    data : numpy.ndarray
+        (n_rows, 3) exc_energy, osc_strength and overlap
+    """
+    dataset = structurGroup[BLOCK]
+    pump_names = np.asarray(dataset.attrs['pumps']).astype(str)
+    return pump_names, np.asarray(dataset.attrs['pump_offsets']), dataset[()]
+
+
+def groupBlock(structurGroup):
+    """
+    reads the block of a structure from the nested pump groups or the 2-D
+    peak dataset.
+
+    Probe names are not stored in the hdf5 File and therefore unknown, the
+    same holds for the overlaps of the nested pump groups.
+
+    Parameters
+    ----------
+    structurGroup : h5py Group
+        group of the structure (time/structure)
+
+    Returns
+    -------
+    dict
+        the columns of the block
+    """
+    if BLOCK in structurGroup:
+        pump_names, pump_offsets, data = readBlockDataset(structurGroup)
+        return peakBlock(np.repeat(pump_names, np.diff(pump_offsets)), data[:, 0], data[:, 1], data[:, 2])
+
+    pumps, exc, osc = [], [], []
+
+    for pump_name, pumpGroup in structurGroup.items():
+        if pump_name in POPULATIONS:
+            continue
+        exc.append(pumpGroup['exc_energy'][()])
+        osc.append(pumpGroup['osc_strength'][()])
+        pumps.extend([pump_name] * exc[-1].shape[0])
+
+    if not exc:
+        return peakBlock([], [], [])
+
+    return peakBlock(pumps, np.concatenate(exc), np.concatenate(osc))
+
+
+def _timeKey(name):
+    try:
+        return (0, float(name), name)
+    except ValueError:
+        return (1, 0.0, name)
+
+
+def _codes(values, names):
+    """maps the values onto indices of the sorted unique names (None -> -1)"""
+    lookup = {name: i for i, name in enumerate(names)}
+    return np.fromiter((lookup.get(value, -1) for value in values), dtype=np.int32, count=len(values))
+
+
+def _concatenate(arrays, dtype):
+    return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+
+
+def updatePeakTable(hdf5File, indexFile, blocks=None, compression='gzip', **kwargs):
+    """
+    (re)writes the peak table of the hdf5 File to its index File.
+
+    Blocks of structures that are not given are taken from an existing peak
+    table or, if not present there, read from the nested groups.
+
+    Parameters
+    ----------
+    hdf5File : h5py File object
+        file object written by TAtoHDF5
+    indexFile : h5py File object
+        index File of hdf5File opened for writing, see indexPath
+    blocks : dict, optional
+        {(time, structure): block} of freshly written structures, see peakBlock
+    compression : str, optional
+        compression filter of the row datasets, by default 'gzip'
+    kwargs
+        passed to create_dataset of the row datasets
+    """
+    blocks = blocks or {}
+    old = PeakTable.read(indexFile) if GROUP in indexFile else None
+
+    times = sorted((name for name in hdf5File if timeindex.timeValue(name) is not None), key=_timeKey)
+    trajectories = sorted({structur for time in times for structur in hdf5File[time]})
+    traj_index = {name: j for j, name in enumerate(trajectories)}
+
+    present = np.zeros((len(times), len(trajectories)), dtype=bool)
+    ordered = []
+    pops = {pattern: {} for pattern in POPULATIONS}
+
+    for t, time in enumerate(times):
+        timeGroup = hdf5File[time]
+        for structur in sorted(timeGroup, key=traj_index.get):
+            j = traj_index[structur]
+            structurGroup = timeGroup[structur]
+            present[t, j] = True
+
+            if (time, structur) in blocks:
+                block = blocks[(time, structur)]
+            elif old is not None and old.hasBlock(time, structur):
+                block = old.block(time, structur)
+            else:
+                block = groupBlock(structurGroup)
+            ordered.append((t, j, block))
+
+            for pattern in POPULATIONS:
+                if pattern in structurGroup:
+                    pops[pattern][(t, j)] = structurGroup[pattern][()]
+
+    if GROUP in indexFile:
+        del indexFile[GROUP]
+    group = indexFile.create_group(GROUP)
+    group.attrs['version'] = VERSION
+
+    pump_names = sorted({name for _, _, block in ordered for name in block['pump']})
+    probe_names = sorted({name for _, _, block in ordered for name in block['probe'] if name is not None})
+
+    group.create_dataset('times', data=np.asarray(times, dtype='S'))
+    group.create_dataset('trajectories', data=np.asarray(trajectories, dtype='S'))
+    group.create_dataset('pumps', data=np.asarray(pump_names, dtype='S'))
+    group.create_dataset('probes', data=np.asarray(probe_names, dtype='S'))
+
+    sizes = np.zeros(len(times) * len(trajectories), dtype=np.int64)
+    for t, j, block in ordered:
+        sizes[t * len(trajectories) + j] = block['exc_energy'].shape[0]
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    group.create_dataset('offsets', data=offsets)
+    group.create_dataset('present', data=present)
+
+    n_rows = int(offsets[-1])
+    counts = [block['exc_energy'].shape[0] for _, _, block in ordered]
+    rows = {
+        'time': np.repeat(np.asarray([t for t, _, _ in ordered], dtype=np.int32), counts),
+        'trajectory': np.repeat(np.asarray([j for _, j, _ in ordered], dtype=np.int32), counts),
+        'pump': _concatenate([_codes(block['pump'], pump_names) for _, _, block in ordered], np.int32),
+        'probe': _concatenate([_codes(block['probe'], probe_names) for _, _, block in ordered], np.int32),
+    }
+    for column in COLUMNS:
+        rows[column] = _concatenate([block[column] for _, _, block in ordered], np.float64)
+
+    for name, data in rows.items():
+        group.create_dataset(name, data=data, chunks=True if n_rows else None,
+                             compression=compression if n_rows else None,
+                             shuffle=bool(n_rows and compression), **kwargs)
+
+    for pattern in POPULATIONS:
+        n_states = max((pop.shape[0] for pop in pops[pattern].values()), default=0)
+        data = np.full((len(times), len(trajectories), n_states), np.nan)
+        for (t, j), pop in pops[pattern].items():
+            data[t, j, :pop.shape[0]] = pop
+        group.create_dataset(pattern, data=data)
+
+
+class PeakTable:
+    """
+    in memory copy of the peak table of an index File, read in a few bulk reads.
+
+    Parameters
+    ----------
+    arrays : dict
+        the datasets of the peak table group
+    """
+
+    def __init__(self, arrays):
+        self.times = arrays['times'].astype(str)
+        self.trajectories = arrays['trajectories'].astype(str)
+        self.pumps = arrays['pumps'].astype(str)
+        self.probes = arrays['probes'].astype(str)
+        self.offsets = arrays['offsets']
+        self.present = arrays['present']
+        self.arrays = arrays
+
+        self.time_index = {name: t for t, name in enumerate(self.times)}
+        self.traj_index = {name: j for j, name in enumerate(self.trajectories)}
+
+    @classmethod
+    def read(cls, indexFile, columns=None, trajectories=None):
+        """
+        reads the peak table of an index File.
+
+        Parameters
+        ----------
+        indexFile : h5py File object
+            index File containing a peak table
+        columns : iterable, optional
+            row datasets to read, by default all
+        trajectories : iterable, optional
+            only the rows of the range of stored trajectories from the first
+            to the last of these are read (one contiguous slice per time
+            step), by default all
+
+        Returns
+        -------
+        PeakTable
+        """
+        group = indexFile[GROUP]
+        names = ['times', 'pumps', 'probes']
+        columns = list(columns) if columns is not None else ['time', 'trajectory', 'pump', 'probe'] + list(COLUMNS)
+
+        arrays = {name: group[name][()] for name in names}
+        stored = group['trajectories'][()]
+        offsets = group['offsets'][()]
+
+        if trajectories is None:
+            arrays['trajectories'] = stored
+            arrays['offsets'] = offsets
+            for name in ['present'] + list(POPULATIONS) + columns:
+                arrays[name] = group[name][()]
+            return cls(arrays)
+
+        # the stored trajectories are sorted, j0:j1 covers all requested ones
+        j = np.searchsorted(stored, np.asarray(list(trajectories), dtype='S'))
+        j = j[j < stored.shape[0]]
+        j0, j1 = (int(j.min()), int(j.max()) + 1) if j.shape[0] else (0, 0)
+
+        n_time, n_traj = arrays['times'].shape[0], stored.shape[0]
+        starts = offsets[np.arange(n_time) * n_traj + j0]
+        stops = offsets[np.arange(n_time) * n_traj + j1]
+
+        arrays['trajectories'] = stored[j0:j1]
+        sizes = np.diff(offsets).reshape(n_time, n_traj)[:, j0:j1]
+        arrays['offsets'] = np.concatenate(([0], np.cumsum(sizes)))
+        for name in ['present'] + list(POPULATIONS):
+            arrays[name] = group[name][:, j0:j1]
+        for name in columns:
+            dataset = group[name]
+            arrays[name] = _concatenate([dataset[start:stop] for start, stop in zip(starts, stops)], dataset.dtype)
+        if 'trajectory' in arrays:
+            arrays['trajectory'] = arrays['trajectory'] - j0
+
+        return cls(arrays)
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def blockSlice(self, t, j):
+        """rows of the structure with time index t and trajectory index j"""
+        k = t * self.trajectories.shape[0] + j
+        return slice(self.offsets[k], self.offsets[k + 1])
+
+    def hasBlock(self, time, structur):
+        try:
+            return bool(self.present[self.time_index[time], self.traj_index[structur]])
+        except KeyError:
+            return False
+
+    def block(self, time, structur):
+        """
+        returns the rows of a structure in the form of peakBlock.
+
+        Parameters
+        ----------
+        time : str
+            group name of the time step
+        structur : str
+            group name of the structure
+        """
+        rows = self.blockSlice(self.time_index[time], self.traj_index[structur])
+        probe = self.arrays['probe'][rows]
+        probe_names = np.full(probe.shape[0], None, dtype=object)
+        probe_names[probe >= 0] = self.probes[probe[probe >= 0]]
+
+        return peakBlock(self.pumps[self.arrays['pump'][rows]],
+                         self.arrays['exc_energy'][rows],
+                         self.arrays['osc_strength'][rows],
+                         self.arrays['overlap'][rows],
+                         probe_names)
@@ -0,0 +1,219 @@
+"""
+opt-in instrumentation of the extraction pipeline.
+
+ExtractFile (and its subclasses), TAtoHDF5 and GetTA have a profiler
+attribute, which by default is NULL: a NullProfiler whose methods do nothing.
+Setting it to a Profiler records the wall time of every stage and counters
+(bytes read, lines scanned, peaks parsed, datasets written, ...) in total and
+per file:
+
+    profiler = Profiler()
+    converter = TAtoHDF5()
+    converter.profiler = profiler
+    converter.createHDF5(path, 'ta.hdf5')
+    print(profiler.summary())
+    profiler.toJSON('profile.json')
+
+Stage names are dotted by component ('extract.index', 'ingest.write', ...),
+stages of a component may run inside a stage of another one (extract.* inside
+ingest.parse), so their times do not add up to the total.
+
+Author: Tobias Kaczun
+"""
+import contextlib
+import json
+import threading
+import time
+
+
+class _NullContext:
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullProfiler:
+    """profiler that records nothing, used when profiling is disabled"""
+
+    enabled = False
+
+    def stage(self, name, file=None):
+        return _NULL_CONTEXT
+
+    def addTime(self, name, seconds, calls=1, file=None):
+        pass
+
+    def count(self, name, value=1, file=None):
+        pass
+
+    def merge(self, other):
+        pass
+
+
+_NULL_CONTEXT = _NullContext()
+NULL = NullProfiler()
+
+
+class Profiler:
+    """
+    records the time spent in named stages and named counters, in total and
+    per file.
+
+    Attributes
+    ----------
+    stages : dict
+        {stage: [time in seconds, calls]}
+    counters : dict
+        {counter: value}
+    files : dict
+        {file: {'stages': {stage: time}, 'counters': {counter: value}}}
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.files = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name, file=None):
+        """
+        context manager timing a stage.
+
+        Parameters
+        ----------
+        name : str
+            name of the stage
+        file : str, optional
+            file the time is attributed to
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addTime(name, time.perf_counter() - start, file=file)
+
+    def addTime(self, name, seconds, calls=1, file=None):
+        """adds the time of a stage measured elsewhere"""
+        with self._lock:
+            total = self.stages.setdefault(name, [0.0, 0])
+            total[0] += seconds
+            total[1] += calls
+            if file is not None:
+                stages = self._file(file)['stages']
+                stages[name] = stages.get(name, 0.0) + seconds
+
+    def count(self, name, value=1, file=None):
+        """
+        adds value to a counter.
+
+        Parameters
+        ----------
+        name : str
+            name of the counter
+        value : int or float, optional
+            by default 1
+        file : str, optional
+            file the value is attributed to
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            if file is not None:
+                counters = self._file(file)['counters']
+                counters[name] = counters.get(name, 0) + value
+
+    def merge(self, other):
+        """
+        adds the records of another Profiler (e.g. of a worker process).
+
+        Parameters
+        ----------
+        other : Profiler or None
+        """
+        if other is None or not other.enabled:
+            return
+        for name, (seconds, calls) in other.stages.items():
+            self.addTime(name, seconds, calls)
+        for name, value in other.counters.items():
+            self.count(name, value)
+        with self._lock:
+            for file, record in other.files.items():
+                mine = self._file(file)
+                for key in ('stages', 'counters'):
+                    for name, value in record[key].items():
+                        mine[key][name] = mine[key].get(name, 0) + value
+
+    def _file(self, file):
+        return self.files.setdefault(file, {'stages': {}, 'counters': {}})
+
+    def report(self, per_file=True):
+        """
+        returns the records as a structure of plain dicts.
+
+        Parameters
+        ----------
+        per_file : bool, optional
+            include the records of the single files, by default True
+
+        Returns
+        -------
+        dict
+            'stages' ({stage: {'time', 'calls'}}), 'counters' and, if
+            requested, 'files'
+        """
+        with self._lock:
+            report = {
+                'stages': {name: {'time': seconds, 'calls': calls}
+                           for name, (seconds, calls) in sorted(self.stages.items())},
+                'counters': dict(sorted(self.counters.items())),
+            }
+            if per_file:
+                report['files'] = {file: {key: dict(record[key]) for key in record}
+                                   for file, record in self.files.items()}
+        return report
+
+    def toJSON(self, filename=None, per_file=True):
+        """
+        serializes the report as JSON.
+
+        Parameters
+        ----------
+        filename : str, optional
+            file the JSON is written to, by default only returned
+        per_file : bool, optional
+            include the records of the single files, by default True
+
+        Returns
+        -------
+        str
+        """
+        text = json.dumps(self.report(per_file=per_file), indent=2)
+        if filename is not None:
+            with open(filename, 'w') as jsonFile:
+                jsonFile.write(text)
+        return text
+
+    def summary(self):
+        """returns the stages and counters as a table"""
+        lines = ['{:<28} {:>10} {:>8}'.format('stage', 'time', 'calls')]
+        for name, (seconds, calls) in sorted(self.stages.items()):
+            lines.append('{:<28} {:>9.3f}s {:>8}'.format(name, seconds, calls))
+        lines.append('{:<28} {:>10}'.format('counter', 'value'))
+        for name, value in sorted(self.counters.items()):
+            lines.append('{:<28} {:>10}'.format(name, value))
+        return '\n'.join(lines)
+
+    def __getstate__(self):
+        # sent back from worker processes, locks can not be pickled
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
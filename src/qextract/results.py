@@ -0,0 +1,224 @@
+"""
+columnar store for the results of many qchem .out files.
+
+Instead of one adcData object (with its own small DataFrames) per file, the
+results of a whole folder are kept in three long tables keyed by a file id:
+
+meta         one row per file: filename, REM keywords, cpu, success
+excitations  one row per excited state: file_id, section ('adc', 'pump',
+             'probe'), term, Excitation energy, Osc. strength, converged,
+             multiplicity, symmetry, state
+pump_probe   one row per transition: file_id, pump, probe, Excitation energy,
+             Osc. strength, overlap
+
+The tables are built directly from the columns of the Extract classes, so
+e.g. all S1 excitation energies across a campaign are a single query:
+
+    table = ResultTable.fromFolder(path, workers=8)
+    table.excitations.query("term == '2 (1) A'")['Excitation energy']
+
+Author: Tobias Kaczun
+"""
+import os
+
+import h5py
+import numpy as np
+import pandas as pd
+
+from qextract import scan
+
+EXCITATION_COLUMNS = ['term', 'Excitation energy', 'Osc. strength', 'converged',
+                      'multiplicity', 'symmetry', 'state']
+PUMP_PROBE_COLUMNS = ['pump', 'probe', 'Excitation energy', 'Osc. strength', 'overlap']
+TABLES = ('meta', 'excitations', 'pump_probe')
+
+
+class RecordExtractor(scan.ScanFile):
+    """ScanFile whose extractFile returns the plain columns of extractRecord"""
+
+    def extractFile(self, filename):
+        return self.extractRecord(filename)
+
+
+class ResultTable:
+    """
+    consolidated results of many qchem .out files.
+
+    Parameters
+    ----------
+    meta : pd.DataFrame
+        one row per file, index is the file id
+    excitations : pd.DataFrame
+        one row per excited state
+    pump_probe : pd.DataFrame
+        one row per pump-probe transition
+    """
+
+    def __init__(self, meta, excitations, pump_probe):
+        self.meta = meta
+        self.excitations = excitations
+        self.pump_probe = pump_probe
+
+    @classmethod
+    def fromFolder(cls, dirPath, pattern='*.out', workers=None, executor='thread'):
+        """
+        extracts all files in a directory into a ResultTable.
+
+        Parameters
+        ----------
+        dirPath : str
+            path to the directory
+        pattern : str, optional
+            glob pattern relative to dirPath, by default '*.out'
+        workers : int, optional
+            number of threads/processes used for parsing, by default None (serial)
+        executor : str, optional
+            'thread' or 'process', by default 'thread'
+
+        Returns
+        -------
+        ResultTable
+        """
+        records = RecordExtractor().iterFolder(dirPath, pattern, workers=workers, executor=executor)
+        # file ids do not depend on the order of completion
+        return cls.fromRecords(sorted(records, key=lambda record: record[0]))
+
+    @classmethod
+    def fromRecords(cls, records):
+        """
+        builds the tables from records.
+
+        Parameters
+        ----------
+        records : iterable
+            (filename, record) with record as returned by ScanFile.extractRecord
+
+        Returns
+        -------
+        ResultTable
+        """
+        meta = []
+        # arrays of every file, concatenated once at the end
+        excitations = {key: [] for key in ['file_id', 'section'] + EXCITATION_COLUMNS}
+        pump_probe = {key: [] for key in ['file_id'] + PUMP_PROBE_COLUMNS}
+
+        for file_id, (filename, record) in enumerate(records):
+            row = dict(record['meta'])
+            # all 'Total job time:' entries of the job
+            row['cpu'] = float(np.sum(row['cpu'])) if len(row['cpu']) else np.nan
+            row['filename'] = filename
+            meta.append(row)
+
+            for section, data in record['excitations'].items():
+                n = len(data['term'])
+                excitations['file_id'].append(np.full(n, file_id, dtype=np.int64))
+                excitations['section'].append(np.full(n, section, dtype=object))
+                for key in EXCITATION_COLUMNS:
+                    excitations[key].append(np.asarray(data[key]))
+
+            if record['pump_probe'] is not None:
+                n = len(record['pump_probe']['pump'])
+                pump_probe['file_id'].append(np.full(n, file_id, dtype=np.int64))
+                for key in PUMP_PROBE_COLUMNS:
+                    pump_probe[key].append(np.asarray(record['pump_probe'][key]))
+
+        meta = pd.DataFrame(meta)
+        if 'filename' in meta:
+            meta = meta[['filename'] + [key for key in meta if key != 'filename']]
+        meta.index.name = 'file_id'
+
+        excitations = pd.DataFrame({key: _concatenate(arrays) for key, arrays in excitations.items()})
+        excitations['section'] = excitations['section'].astype('category')
+        pump_probe = pd.DataFrame({key: _concatenate(arrays) for key, arrays in pump_probe.items()})
+
+        return cls(meta, excitations, pump_probe)
+
+    def toHDF5(self, filename, group='results'):
+        """
+        writes the tables to an hdf5 File, one dataset per column.
+
+        Parameters
+        ----------
+        filename : str
+            path of the hdf5 File, opened in append mode
+        group : str, optional
+            group the tables are written to (replaced if existing), by default 'results'
+        """
+        with h5py.File(filename, 'a') as hdf5File:
+            if group in hdf5File:
+                del hdf5File[group]
+            resultGroup = hdf5File.create_group(group)
+
+            for name in TABLES:
+                df = getattr(self, name)
+                tableGroup = resultGroup.create_group(name)
+                tableGroup.attrs['columns'] = np.asarray(list(df.columns), dtype='S')
+                for i, column in enumerate(df.columns):
+                    data = df[column]
+                    if data.dtype == object or isinstance(data.dtype, pd.CategoricalDtype):
+                        # REM keywords not set in a file are missing
+                        missing = data.isna().to_numpy()
+                        data = data.astype(str).to_numpy(dtype=object)
+                        dataset = tableGroup.create_dataset(str(i), data=data, dtype=h5py.string_dtype(),
+                                                            compression='gzip')
+                        if missing.any():
+                            dataset.attrs['missing'] = np.flatnonzero(missing)
+                    else:
+                        tableGroup.create_dataset(str(i), data=data.to_numpy(), compression='gzip')
+
+    @classmethod
+    def fromHDF5(cls, filename, group='results'):
+        """
+        reads tables written by toHDF5.
+
+        Parameters
+        ----------
+        filename : str
+            path of the hdf5 File
+        group : str, optional
+            group containing the tables, by default 'results'
+
+        Returns
+        -------
+        ResultTable
+        """
+        tables = {}
+
+        with h5py.File(filename, 'r') as hdf5File:
+            for name in TABLES:
+                tableGroup = hdf5File[group][name]
+                columns = tableGroup.attrs['columns'].astype(str)
+                data = {}
+                for i, column in enumerate(columns):
+                    dataset = tableGroup[str(i)]
+                    if h5py.check_string_dtype(dataset.dtype) is not None:
+                        data[column] = dataset.asstr()[()]
+                        if 'missing' in dataset.attrs:
+                            data[column][dataset.attrs['missing']] = np.nan
+                    else:
+                        data[column] = dataset[()]
+                tables[name] = pd.DataFrame(data, columns=columns)
+
+        tables['meta'].index.name = 'file_id'
+        tables['excitations']['section'] = tables['excitations']['section'].astype('category')
+
+        return cls(**tables)
+
+    def toParquet(self, dirPath):
+        """
+        writes the tables as meta.parquet, excitations.parquet and
+        pump_probe.parquet (requires pyarrow or fastparquet).
+
+        Parameters
+        ----------
+        dirPath : str
+            directory of the parquet files, created if needed
+        """
+        os.makedirs(dirPath, exist_ok=True)
+
+        for name in TABLES:
+            getattr(self, name).to_parquet(os.path.join(dirPath, name + '.parquet'))
+
+
+def _concatenate(arrays):
+    return np.concatenate(arrays) if arrays else np.zeros(0)
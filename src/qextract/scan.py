@@ -0,0 +1,544 @@
+"""
+single pass parsing engine for qchem .out files.
+
+Instead of sending every line of the file through the readLine methods of the
+Extract classes, the file is memory mapped and searched once for the section
+markers on the raw bytes (MarkerSearch keeps the next position of every marker
+and only searches again for a marker once it has been passed). Once a section
+starts, the search jumps directly to its end marker, so the lines in between
+are never visited in python. Only the bodies of the relevant sections are
+decoded and handed to the readSection methods of the Extract classes,
+everything else (SCF/Davidson iterations, orbital energies, ...) is never
+decoded and, as the file is not read into a python object, does not add to
+the memory of the process.
+
+Author: Tobias Kaczun
+"""
+import functools
+import mmap
+import os
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from qextract import adcData
+from qextract.extract import (ExtractFile, ExtractRem, ExtractExcitation,
+                              ExtractPumpProbe, ExtractOther)
+
+
+class MarkerSearch:
+    """
+    finds the next occurrence of any of several markers in a text.
+
+    Parameters
+    ----------
+    text : str, bytes or mmap
+        text to be searched
+    markers : dict
+        names of the markers as keys and the markers (of the same type as
+        text) as values
+    """
+
+    def __init__(self, text, markers):
+        self.text = text
+        self.markers = markers
+        # -2: not searched yet, -1: does not occur after the last search
+        self.found = dict.fromkeys(markers, -2)
+
+    def search(self, pos, names=None):
+        """
+        returns the name and position of the first marker at or after pos.
+
+        Parameters
+        ----------
+        pos : int
+            position from which on to search, must not decrease between calls
+        names : iterable, optional
+            names of the markers to search for, by default all markers
+
+        Returns
+        -------
+        kind : str
+            name of the marker found, None if no marker is left
+        index : int
+            position of the marker, -1 if no marker is left
+        """
+        kind, best = None, -1
+        found = self.found
+
+        for name in self.markers if names is None else names:
+            index = found[name]
+            if index == -2 or -1 < index < pos:
+                index = found[name] = self.text.find(self.markers[name], pos)
+            if index != -1 and (best == -1 or index < best):
+                kind, best = name, index
+
+        return kind, best
+
+
+class ScanFile(ExtractFile):
+    """
+    drop-in replacement for ExtractFile that scans each file only once.
+
+    Files containing several jobs are split at the 'User input:' line following
+    a successful job, extractFile returns only the data of the last job (as
+    ExtractFile does), extractJobs and iterJobs the data of every job.
+
+    Parameters
+    ----------
+    lazy : bool, optional
+        only parse $rem, cpu and success when extracting and the excitation
+        and pump-probe sections ('adc', 'pump', 'probe', 'pump_probe') on first
+        access of the attribute, by default False. Lazy sections are read from
+        the file again, which must not change in between.
+    """
+
+    markers = {
+        'rem': ExtractRem.section_start.encode(),
+        'summary': ExtractExcitation.section_start.encode(),
+        'pump_probe': ExtractPumpProbe.section_start.encode(),
+        'cpu': ExtractOther.cpu_time_match.encode(),
+        'end': ExtractOther.end_match.encode(),
+        'user_input': ExtractOther.continuos_job_match.encode(),
+    }
+
+    section_markers = ('rem', 'summary', 'pump_probe', 'cpu', 'end')
+    job_markers = section_markers + ('user_input',)
+
+    section_ends = {
+        'rem': ExtractRem.section_end.encode(),
+        'summary': ExtractExcitation.section_end.encode(),
+        'pump_probe': ExtractPumpProbe.section_end.encode(),
+    }
+
+    def __init__(self, lazy=False):
+        self.lazy = lazy
+
+    def extractFile(self, filename):
+        """
+        reads and parses a qchem .out file.
+
+        Parameters
+        ----------
+        filename : str
+            path to the qchem .out file
+
+        Returns
+        -------
+        adcData
+            data of the (last) job in the file
+        """
+        with open(filename, 'rb') as outfile, self.profiler.stage('extract.file', file=filename):
+            buffer = self.mapFile(outfile)
+            try:
+                with self.profiler.stage('extract.index'):
+                    jobs = self.findJobs(filename, outfile, buffer)
+                cur_data = self.parseJob(buffer, jobs[-1], filename)
+                if self.profiler.enabled:
+                    self.profileData(cur_data, filename, len(buffer))
+                return cur_data
+            finally:
+                if isinstance(buffer, mmap.mmap):
+                    buffer.close()
+
+    def iterJobs(self, outfile, filename):
+        """
+        generator yielding one adcData per job, the file is indexed once and
+        every job parsed when it is requested.
+
+        Parameters
+        ----------
+        outfile : file object
+            qchem .out file opened with mode 'rb'
+        filename : str
+            name of the file, stored in the adcData objects
+
+        Yields
+        ------
+        adcData
+            data of a job
+        """
+        buffer = self.mapFile(outfile)
+        try:
+            for job in self.findJobs(filename, outfile, buffer):
+                yield self.parseJob(buffer, job, filename)
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+
+    def extractJobs(self, filename, workers=None, executor='thread'):
+        """
+        parses every job of a file containing several (chained) jobs.
+
+        Parameters
+        ----------
+        filename : str
+            path to the qchem .out file
+        workers : int, optional
+            number of threads/processes parsing the jobs concurrently after
+            the file has been split, by default None (serial)
+        executor : str, optional
+            'thread' or 'process', by default 'thread'
+
+        Returns
+        -------
+        list(adcData)
+            one adcData per job in the order of the file
+        """
+        with open(filename, 'rb') as outfile:
+            if workers is None or workers <= 1:
+                return list(self.iterJobs(outfile, filename))
+
+            buffer = self.mapFile(outfile)
+            try:
+                jobs = self.findJobs(filename, outfile, buffer)
+            finally:
+                if isinstance(buffer, mmap.mmap):
+                    buffer.close()
+
+        Executor = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}[executor]
+        with Executor(max_workers=min(workers, len(jobs))) as pool:
+            return list(pool.map(_parseJob, [self] * len(jobs), [filename] * len(jobs), jobs))
+
+    def mapFile(self, outfile):
+        """
+        memory maps a file opened in binary mode (read only).
+
+        Parameters
+        ----------
+        outfile : file object
+            file opened with mode 'rb'
+
+        Returns
+        -------
+        mmap or bytes
+            the mapped file, empty bytes for an empty file (which can not be
+            mapped)
+        """
+        try:
+            return mmap.mmap(outfile.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return b''
+
+    def findJobs(self, filename, outfile, buffer):
+        """
+        returns the section offsets of all jobs in the file, see indexBuffer.
+
+        Subclasses may look them up instead of scanning the buffer.
+
+        Parameters
+        ----------
+        filename : str
+            path to the qchem .out file
+        outfile : file object
+            the file opened with mode 'rb'
+        buffer : mmap or bytes
+            complete content of the file
+
+        Returns
+        -------
+        list(dict)
+        """
+        return self.indexBuffer(buffer)
+
+    def indexBuffer(self, buffer):
+        """
+        locates the sections of all jobs in the file.
+
+        Parameters
+        ----------
+        buffer : mmap or bytes
+            complete content of the qchem .out file
+
+        Returns
+        -------
+        jobs : list(dict)
+            one dict per job, containing the (start, end) byte offsets of the
+            bodies of the 'rem' section, of all 'summary' sections and of the
+            'pump_probe' section (None if not found), the offsets of the 'cpu'
+            lines and the 'success' flag
+        """
+        jobs = [self._newJob()]
+        markers = MarkerSearch(buffer, ScanFile.markers)
+        pos = 0
+
+        while True:
+            job = jobs[-1]
+            # 'User input:' only matters after a finished job, searching it
+            # earlier would mean an additional pass over the whole file
+            kind, index = markers.search(pos, ScanFile.job_markers if job['success'] else ScanFile.section_markers)
+            if kind is None:
+                break
+
+            pos = index + len(ScanFile.markers[kind])
+
+            if kind in ScanFile.section_ends:
+                if kind == 'rem' and job['rem'] is not None:
+                    continue
+                # body starts with the line after the marker and ends before
+                # the line containing the end marker
+                start = self._lineEnd(buffer, pos)
+                end_match = buffer.find(ScanFile.section_ends[kind], start)
+                if end_match == -1:
+                    end_match = len(buffer)
+                end = buffer.rfind(b'\n', start, end_match) + 1 or start
+                if kind == 'summary':
+                    job['summary'].append((start, end))
+                else:
+                    job[kind] = (start, end)
+                # continues after the line containing the end marker
+                pos = self._lineEnd(buffer, end_match)
+
+            elif kind == 'cpu':
+                job['cpu'].append((index, self._lineEnd(buffer, pos)))
+
+            elif kind == 'end':
+                job['success'] = True
+
+            elif job['success']:
+                # 'User input:' after a finished job starts the next one
+                jobs.append(self._newJob())
+
+        return jobs
+
+    def parseJob(self, buffer, job, filename):
+        """
+        parses the sections of a single job found by indexBuffer.
+
+        Parameters
+        ----------
+        buffer : mmap or bytes
+            complete content of the qchem .out file
+        job : dict
+            section offsets of the job as returned by indexBuffer
+        filename : str
+            name of the file, stored in the adcData object
+
+        Returns
+        -------
+        adcData
+            data of the job, in lazy mode the sections are parsed on first
+            access
+        """
+        cur_data = adcData.adcData(filename)
+
+        if self.lazy:
+            exRem, exOth = self.readMeta(buffer, job, filename)
+            spans = self.sectionSpans(exRem, job)
+            if spans:
+                stat = os.stat(filename)
+                cur_data.setLazy(list(spans), functools.partial(
+                    self.loadSection, filename, spans, (stat.st_size, stat.st_mtime_ns)))
+            cur_data.setOtherAttr(exRem, exOth)
+            return cur_data
+
+        extractors = self.readJob(buffer, job, filename)
+        sections = [key for key in extractors if key not in ('rem', 'other')]
+        if sections:
+            with self.profiler.stage('extract.dataframe'):
+                cur_data.setData(sections, [extractors[key].getDataFrame() for key in sections])
+
+        cur_data.setOtherAttr(extractors['rem'], extractors['other'])
+
+        return cur_data
+
+    def readMeta(self, buffer, job, filename):
+        """
+        runs ExtractRem and ExtractOther on a single job.
+
+        Parameters
+        ----------
+        buffer : mmap or bytes
+            complete content of the qchem .out file
+        job : dict
+            section offsets of the job as returned by indexBuffer
+        filename : str
+            name of the file (used for the basis of 'gen' calculations)
+
+        Returns
+        -------
+        exRem : ExtractRem
+        exOth : ExtractOther
+        """
+        exRem = self._readSection(ExtractRem(), buffer, job['rem'])
+        exOth = ExtractOther()
+        for start, end in job['cpu']:
+            exOth.readCpu(buffer[start:end].decode())
+        exOth.data['success'] = job['success']
+
+        if exRem.data['BASIS'].casefold() == 'gen':
+            exRem.getBASISfromFN(filename)
+
+        return exRem, exOth
+
+    def sectionSpans(self, exRem, job):
+        """
+        assigns the sections of a job to the adcData attributes.
+
+        Parameters
+        ----------
+        exRem : ExtractRem
+            $rem section of the job
+        job : dict
+            section offsets of the job as returned by indexBuffer
+
+        Returns
+        -------
+        dict
+            names of the attributes ('pump', 'probe', 'pump_probe' for FANO,
+            'adc' for ADC calculations) as keys and (Extract class, span) as
+            values, span is None if the section was not found
+        """
+        summaries = job['summary'] + [None, None]
+
+        if 'FANO'.casefold() in exRem.data['METHOD'].casefold():
+            return {
+                'pump': (ExtractExcitation, summaries[1]),
+                'probe': (ExtractExcitation, summaries[0]),
+                'pump_probe': (ExtractPumpProbe, job['pump_probe']),
+            }
+        elif 'adc' in exRem.data['METHOD'].casefold():
+            return {'adc': (ExtractExcitation, summaries[0])}
+
+        return {}
+
+    def readJob(self, buffer, job, filename):
+        """
+        runs the Extract classes on the sections of a single job.
+
+        Parameters
+        ----------
+        buffer : mmap or bytes
+            complete content of the qchem .out file
+        job : dict
+            section offsets of the job as returned by indexBuffer
+        filename : str
+            name of the file (used for the basis of 'gen' calculations)
+
+        Returns
+        -------
+        dict
+            the section extractors under the names of the adcData attributes
+            (see sectionSpans), 'rem' (ExtractRem) and 'other' (ExtractOther)
+        """
+        exRem, exOth = self.readMeta(buffer, job, filename)
+
+        extractors = {}
+        for key, (extractor, span) in self.sectionSpans(exRem, job).items():
+            extractors[key] = self._readSection(extractor(), buffer, span)
+
+        extractors['rem'] = exRem
+        extractors['other'] = exOth
+
+        return extractors
+
+    def loadSection(self, filename, spans, stat, key):
+        """
+        parses a single section of a file indexed before (lazy mode).
+
+        Parameters
+        ----------
+        filename : str
+            path to the qchem .out file
+        spans : dict
+            as returned by sectionSpans
+        stat : tuple
+            (size, modification time in ns) of the file when it was indexed
+        key : str
+            name of the attribute
+
+        Returns
+        -------
+        pd.DataFrame
+        """
+        current = os.stat(filename)
+        if (current.st_size, current.st_mtime_ns) != stat:
+            raise RuntimeError('{} changed since it was indexed'.format(filename))
+
+        extractor, span = spans[key]
+        extractor = extractor()
+        if span is not None:
+            with open(filename, 'rb') as outfile:
+                outfile.seek(span[0])
+                extractor.readSection(outfile.read(span[1] - span[0]).decode())
+
+        return extractor.getDataFrame()
+
+    def extractRecord(self, filename):
+        """
+        parses the (last) job of a file into plain columns without building
+        DataFrames, see results.ResultTable.
+
+        Parameters
+        ----------
+        filename : str
+            path to the qchem .out file
+
+        Returns
+        -------
+        dict
+            'meta' (REM keywords, cpu and success), 'excitations' ({section:
+            {column: array}}) and 'pump_probe' ({column: array})
+        """
+        with open(filename, 'rb') as outfile, self.profiler.stage('extract.file', file=filename):
+            buffer = self.mapFile(outfile)
+            try:
+                with self.profiler.stage('extract.index'):
+                    jobs = self.findJobs(filename, outfile, buffer)
+                extractors = self.readJob(buffer, jobs[-1], filename)
+                nbytes = len(buffer)
+            finally:
+                if isinstance(buffer, mmap.mmap):
+                    buffer.close()
+
+        record = {
+            'meta': dict(extractors.pop('rem').data, **extractors.pop('other').data),
+            'excitations': {},
+            'pump_probe': None,
+        }
+        for key, extractor in extractors.items():
+            if isinstance(extractor, ExtractPumpProbe):
+                record[key] = extractor.getColumns()
+            else:
+                record['excitations'][key] = extractor.getColumns()
+
+        if self.profiler.enabled:
+            # same counters as profileData
+            self.profiler.count('bytes', nbytes, file=filename)
+            sections = list(record['excitations'].values()) + [record['pump_probe']]
+            for columns in sections:
+                if columns:
+                    self.profiler.count('peaks', len(next(iter(columns.values()))), file=filename)
+
+        return record
+
+    def _readSection(self, extractor, buffer, span):
+        if span is not None:
+            with self.profiler.stage('extract.convert'):
+                extractor.readSection(buffer[span[0]:span[1]].decode())
+            self.profiler.count('bytes_decoded', span[1] - span[0])
+        return extractor
+
+    def _lineEnd(self, buffer, pos):
+        end = buffer.find(b'\n', pos)
+        return len(buffer) if end == -1 else end + 1
+
+    def _newJob(self):
+        return {
+            'rem': None,
+            'summary': [],
+            'pump_probe': None,
+            'cpu': [],
+            'success': False,
+        }
+
+
+def _parseJob(extractor, filename, job):
+    # module level so it can be sent to worker processes, every worker maps
+    # the file itself
+    with open(filename, 'rb') as outfile:
+        buffer = extractor.mapFile(outfile)
+        try:
+            return extractor.parseJob(buffer, job, filename)
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
@@ -0,0 +1,197 @@
+"""
+persistent index of the section offsets of qchem .out files.
+
+ScanFile has to search a whole output for the section markers before it can
+parse anything. IndexedScanFile stores the result of this search (the byte
+offsets of the $rem section, the 'Excited State Summary' sections, the
+'Pump-Probe Results', the 'Total job time:' lines and the job boundaries at
+'User input:') in a central SQLite database. Extracting the same file again
+only touches the pages of the sections that are actually parsed, which
+matters when an archive of large outputs is reprocessed.
+
+An entry is only used as long as size and modification time of the output
+are unchanged, otherwise the file is scanned and the entry replaced.
+
+Author: Tobias Kaczun
+"""
+import json
+import mmap
+import os
+import sqlite3
+
+from qextract.scan import ScanFile
+
+# stored with every entry, entries of other versions are ignored
+INDEX_VERSION = 1
+
+
+class IndexedScanFile(ScanFile):
+    """
+    ScanFile that keeps the section offsets of every file in a database.
+
+    Parameters
+    ----------
+    database : str
+        path of the SQLite database, created if needed. Several threads or
+        processes may share it.
+    lazy : bool, optional
+        see ScanFile, by default False
+
+    Attributes
+    ----------
+    hits : int
+        number of files whose offsets were taken from the database
+    misses : int
+        number of files that had to be scanned
+    """
+
+    def __init__(self, database, lazy=False):
+        ScanFile.__init__(self, lazy)
+        self.database = database
+        self.hits = 0
+        self.misses = 0
+
+        with self.connect() as con:
+            con.execute('CREATE TABLE IF NOT EXISTS sections ('
+                        'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+                        'version INTEGER, jobs TEXT)')
+        con.close()
+
+    def connect(self):
+        """
+        opens a connection to the database.
+
+        A new connection is used for every file, so the extractor can be used
+        from several threads and sent to worker processes.
+
+        Returns
+        -------
+        sqlite3.Connection
+        """
+        return sqlite3.connect(self.database, timeout=60)
+
+    def findJobs(self, filename, outfile, buffer):
+        """
+        returns the section offsets from the database or scans the file and
+        stores them.
+
+        Parameters
+        ----------
+        filename : str
+            path to the qchem .out file
+        outfile : file object
+            the file opened with mode 'rb'
+        buffer : mmap or bytes
+            complete content of the file
+
+        Returns
+        -------
+        list(dict)
+            see ScanFile.indexBuffer
+        """
+        stat = os.fstat(outfile.fileno())
+
+        jobs = self.getJobs(filename, stat)
+        if jobs is not None:
+            self.hits += 1
+            return jobs
+
+        self.misses += 1
+        jobs = self.indexBuffer(buffer)
+        self.storeJobs(filename, stat, jobs)
+
+        return jobs
+
+    def getJobs(self, filename, stat=None):
+        """
+        looks up the section offsets of a file.
+
+        Parameters
+        ----------
+        filename : str
+            path to the qchem .out file
+        stat : os.stat_result, optional
+            current stat of the file, by default taken from the file
+
+        Returns
+        -------
+        list(dict) or None
+            offsets as returned by ScanFile.indexBuffer, None if the file is
+            not in the database or has changed
+        """
+        if stat is None:
+            stat = os.stat(filename)
+
+        con = self.connect()
+        try:
+            row = con.execute('SELECT size, mtime_ns, version, jobs FROM sections WHERE path = ?',
+                              (os.path.abspath(filename),)).fetchone()
+        finally:
+            con.close()
+
+        if row is None or tuple(row[:3]) != (stat.st_size, stat.st_mtime_ns, INDEX_VERSION):
+            return None
+
+        return json.loads(row[3])
+
+    def storeJobs(self, filename, stat, jobs):
+        """
+        stores the section offsets of a file.
+
+        Parameters
+        ----------
+        filename : str
+            path to the qchem .out file
+        stat : os.stat_result
+            stat of the file the offsets belong to
+        jobs : list(dict)
+            offsets as returned by ScanFile.indexBuffer
+        """
+        with self.connect() as con:
+            con.execute('INSERT OR REPLACE INTO sections VALUES (?, ?, ?, ?, ?)',
+                        (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns,
+                         INDEX_VERSION, json.dumps(jobs)))
+        con.close()
+
+    def indexFile(self, filename):
+        """
+        makes sure the offsets of a file are in the database, without parsing
+        any section.
+
+        Parameters
+        ----------
+        filename : str
+            path to the qchem .out file
+
+        Returns
+        -------
+        list(dict)
+            see ScanFile.indexBuffer
+        """
+        with open(filename, 'rb') as outfile:
+            buffer = self.mapFile(outfile)
+            try:
+                return self.findJobs(filename, outfile, buffer)
+            finally:
+                if isinstance(buffer, mmap.mmap):
+                    buffer.close()
+
+    def removeMissing(self):
+        """
+        removes the entries of files that do not exist anymore.
+
+        Returns
+        -------
+        int
+            number of removed entries
+        """
+        con = self.connect()
+        try:
+            paths = [row[0] for row in con.execute('SELECT path FROM sections')]
+            missing = [(path,) for path in paths if not os.path.exists(path)]
+            with con:
+                con.executemany('DELETE FROM sections WHERE path = ?', missing)
+        finally:
+            con.close()
+
+        return len(missing)
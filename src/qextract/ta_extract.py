@@ -28,29 +28,205 @@ This will result in the following structure in the hdf:
 ...
 With only the first part of the .out Filename up to the first '_' will be used as group name in the hdf File
 
+With layout='block' the pump groups are replaced by a single 2-D dataset per
+structure ('peaks', see the peaktable module) carrying the pump state names
+and their row offsets as attributes, which avoids the metadata of thousands of
+tiny datasets. Chunking, compression, shuffle and fill value of the per file
+datasets can be set with dataset_options.
+
+The top level of the hdf5 File only holds the time step groups. A sorted
+index of the time steps ('time_index', see the timeindex module) and a
+consolidated peak table ('peak_table', see the peaktable module), which allows
+reading all peaks in a few bulk reads, are written to a separate index File
+next to it ('ta.hdf5' -> 'ta.index.hdf5').
+
+Every structure group carries the fingerprint of its .out file ('source_file',
+'source_size', 'source_mtime_ns' and, for files written in append mode,
+'source_sha1') as attributes, which is used by the append mode to skip files
+that have already been written.
+
 Author: Tobias Kaczun
 """
 
 import os
+import collections
 import glob
+import hashlib
+import time
 import h5py
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
 
-from qextract import extract
+from qextract import peaktable, profiling, scan, timeindex
 
 # TODO: write docstrings
-# TODO: parallelization and
-# TODO: 'append mode'
-# TODO: command line call
 
-def writeHDF5(outFilepath, hdf5_filename, adiabatic=True):
-    TAtoHDF5().createHDF5(outFilepath, hdf5_filename, adiabatic=adiabatic)
+def writeHDF5(outFilepath, hdf5_filename, adiabatic=True, workers=None, append=False):
+    TAtoHDF5().createHDF5(outFilepath, hdf5_filename, adiabatic=adiabatic, workers=workers, append=append)
+
+
+def datasetOptions(size, options):
+    """
+    keyword arguments of create_dataset for a dataset with size elements.
+
+    Chunking and filters are dropped for empty datasets, which HDF5 can not
+    chunk.
+
+    Parameters
+    ----------
+    size : int
+        number of elements of the dataset
+    options : dict
+        create_dataset keywords (chunks, compression, compression_opts,
+        shuffle, fillvalue, ...)
+
+    Returns
+    -------
+    dict
+    """
+    if size or not options:
+        return options
+    return {key: value for key, value in options.items()
+            if key not in ('chunks', 'compression', 'compression_opts', 'shuffle', 'scaleoffset', 'fletcher32')}
+
+
+def fileFingerprint(filepath, content_hash=True):
+    """
+    collects size, modification time and (optionally) the sha1 hash of a file.
+
+    The keys are used as attribute names of the structure group in the hdf5 File.
+
+    Parameters
+    ----------
+    filepath : str
+        path to the file
+    content_hash : bool, optional
+        whether the sha1 hash of the content is computed, by default True
+
+    Returns
+    -------
+    fingerprint : dict
+        'source_size', 'source_mtime_ns' and, if requested, 'source_sha1'
+    """
+    stat = os.stat(filepath)
+    fingerprint = {
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+    }
+
+    if content_hash:
+        sha1 = hashlib.sha1()
+        with open(filepath, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                sha1.update(block)
+        fingerprint['source_sha1'] = sha1.hexdigest()
+
+    return fingerprint
+
+
+def parseOutputFile(filepath, profiler=None, content_hash=False):
+    """
+    parses a single qchem .out file and returns its pump-probe excitation energies
+    and oscillator strengths as plain numpy arrays.
+
+    Module level function so it can be sent to the worker processes of a
+    ProcessPoolExecutor.
+
+    Parameters
+    ----------
+    filepath : str
+        path to the qchem .out file
+    profiler : profiling.Profiler, optional
+        records the stages of the file, by default None
+    content_hash : bool, optional
+        whether the sha1 hash of the file is part of the fingerprint, by
+        default False (only needed by the append mode)
+
+    Returns
+    -------
+    filepath : str
+        the path that was parsed
+    pumps : list(tuple)
+        (pump_name, exc_energy, osc_strength, overlap, probe_names) for every
+        unique pump state in the order of appearance, white spaces in pump_name
+        are replaced by '_'
+    fingerprint : dict
+        fingerprint of the file as returned by fileFingerprint
+    """
+    profiler = profiler if profiler is not None else profiling.NULL
+
+    with profiler.stage('ingest.fingerprint', file=filepath):
+        fingerprint = fileFingerprint(filepath, content_hash=content_hash)
+
+    extractor = scan.ScanFile()
+    extractor.profiler = profiler
+    pump_probe = extractor.extractRecord(filepath)['pump_probe']
+    if pump_probe is None:
+        raise ValueError('{} contains no Pump-Probe Results'.format(filepath))
+
+    pumps = []
+    with profiler.stage('ingest.convert', file=filepath):
+        # the rows of every pump state are consecutive, in the order of
+        # appearance of the pump states
+        pump = pump_probe['pump']
+        if pump.shape[0]:
+            starts = np.flatnonzero(np.r_[True, pump[1:] != pump[:-1]])
+            ends = np.r_[starts[1:], pump.shape[0]]
+            for start, end in zip(starts, ends):
+                # it seems white spaces in the group/ dataset names create problems ...
+                pumps.append((pump[start].replace(' ', '_'),
+                              pump_probe['Excitation energy'][start:end],
+                              pump_probe['Osc. strength'][start:end],
+                              pump_probe['overlap'][start:end],
+                              pump_probe['probe'][start:end]))
+
+    return filepath, pumps, fingerprint
+
+
+def _parseOutputFileSafe(filepath, profile=False, content_hash=False):
+    # module level so it can be sent to worker processes, the exception is
+    # returned so the files after a broken one are still parsed. With profile
+    # the records of the file are returned as a Profiler.
+    profiler = profiling.Profiler() if profile else None
+    try:
+        return parseOutputFile(filepath, profiler, content_hash) + (None, profiler)
+    except Exception as error:
+        return filepath, None, None, error, profiler
+
+
+def _parseOutputFilesSafe(filepaths, profile=False, content_hash=False):
+    # a chunk of files parsed by one task of a worker process
+    return [_parseOutputFileSafe(filepath, profile, content_hash) for filepath in filepaths]
+
 
 class TAtoHDF5:
     """
     class to read in excitation energies and oscillator strengths of a directory and store them in an hdf5 File.
     """
 
-    def createHDF5(self, pathname, filename, adiabatic=True, **kwargs):
+    # replaced by a profiling.Profiler to record the stages of every file
+    # (also of the parsing in worker processes)
+    profiler = profiling.NULL
+    # 'groups': a group with the datasets exc_energy and osc_strength per pump
+    # state, 'block': one 2-D dataset per structure
+    layout = 'groups'
+    # create_dataset keywords of the per file datasets
+    dataset_options = {}
+
+    def __init__(self):
+        # peak table blocks of the structures written by iterateFiles
+        self.blocks = {}
+        # wall time in seconds of the stages of the last createHDF5 call
+        self.timings = {}
+        # (population file, line) of the populations of the last createHDF5
+        # call without a structure group, counted as 'missing_pop' or
+        # 'missing_diapop' by the profiler
+        self.missing = []
+
+    def createHDF5(self, pathname, filename, adiabatic=True, workers=None, chunksize=1, append=False,
+                   peak_table=True, compression='gzip', progress=None, skip_errors=False, layout=None,
+                   dataset_options=None, **kwargs):
         """
         creates an hdf5 File containing excitation energies and oscillator strengths of the pump_probe calculation in the given directory.
         
@@ -60,26 +236,103 @@ class TAtoHDF5:
             path to directory that is to be read
         filename : str
             filename (and path) for the hdf5 that is to be created
+        workers : int, optional
+            number of processes used to parse the .out files, by default None
+            (serial). The hdf5 File is always written by the calling process
+            only, in the same order as in the serial case.
+        chunksize : int, optional
+            number of files sent to a worker process at once, by default 1
+        append : bool, optional
+            incremental mode, by default False. Only .out files that are new or
+            have changed since they were last written to the hdf5 File are
+            parsed, the datasets of changed files are replaced.
+        peak_table : bool, optional
+            whether the consolidated peak table is (re)written to the index
+            File, by default True
+        compression : str, optional
+            compression filter of the peak table, by default 'gzip'
+        progress : object, optional
+            receives start(outfiles) once the files to parse are known and
+            update(filepath, error) after every file, see iterateFiles
+        skip_errors : bool, optional
+            skip files that can not be parsed instead of raising, by default
+            False
+        layout : str, optional
+            'groups' or 'block', by default the layout attribute ('groups')
+        dataset_options : dict, optional
+            create_dataset keywords of the per file datasets, e.g.
+            {'chunks': True, 'compression': 'gzip', 'shuffle': True}, by
+            default the dataset_options attribute (contiguous, uncompressed)
 
         Returns
         -------
         None.
 
         """
+        if layout is not None:
+            if layout not in ('groups', 'block'):
+                raise ValueError("layout has to be 'groups' or 'block', not {!r}".format(layout))
+            self.layout = layout
+        if dataset_options is not None:
+            self.dataset_options = dataset_options
+
         self.pathname = pathname
         
         if self.pathname[-1] != '/':
             self.pathname = self.pathname + '/'
         
+        self.timings = {}
+        self.missing = []
+        start = time.perf_counter()
         outfiles = self.getOutputFiles()
+        self.blocks = {}
+
+        # an index File written for another state of the hdf5 File (e.g.
+        # before it was modified by other tools) can not be updated
+        with peaktable.openIndex(filename) as indexFile:
+            index_mode = 'w' if indexFile is None else 'a'
 
         with h5py.File(filename, 'a', **kwargs) as hdf5File:
-            self.iterateFiles(outfiles, hdf5File)
+            # files of former versions kept the index at the top level
+            for name in (timeindex.GROUP, peaktable.GROUP):
+                if name in hdf5File:
+                    del hdf5File[name]
+
+            if append:
+                outfiles = [filepath for filepath in outfiles
+                            if not self.isIngested(hdf5File, filepath)]
+            start = self._stage('scan', start)
+
+            self.iterateFiles(outfiles, hdf5File, workers=workers, chunksize=chunksize, replace=append,
+                              progress=progress, skip_errors=skip_errors)
+            start = self._stage('parse', start)
             
             if adiabatic:
                 self.setAdibaticPop(hdf5File)
             
             self.setDiabaticPop(hdf5File)
+            start = self._stage('populations', start)
+
+        # written once the hdf5 File is closed, so its final size and
+        # modification time are stored
+        with h5py.File(filename, 'r') as hdf5File, \
+                h5py.File(peaktable.indexPath(filename), index_mode) as indexFile:
+            timeindex.writeTimeIndex(hdf5File, indexFile)
+            start = self._stage('time_index', start)
+
+            if peak_table:
+                peaktable.updatePeakTable(hdf5File, indexFile, self.blocks, compression=compression)
+                start = self._stage('peak_table', start)
+            elif peaktable.GROUP in indexFile:
+                del indexFile[peaktable.GROUP]
+
+            peaktable.stampIndex(indexFile, filename)
+
+    def _stage(self, name, start):
+        end = time.perf_counter()
+        self.timings[name] = end - start
+        self.profiler.addTime('ingest.' + name, end - start)
+        return end
 
     def getOutputFiles(self):
         """
@@ -102,7 +355,8 @@ class TAtoHDF5:
 
         return outfiles
 
-    def iterateFiles(self, outfiles, hdf5File):
+    def iterateFiles(self, outfiles, hdf5File, workers=None, chunksize=1, replace=False, progress=None,
+                     skip_errors=False):
         """
         iterates over .out files and appends their Pump-Probe excitation energy and oscillator strength to the HDF5.
 
@@ -112,38 +366,209 @@ class TAtoHDF5:
             list of paths for files to iterate
         hdf5File : h5py File object
             file object to which the data is to be appended
+        workers : int, optional
+            number of processes used for parsing, by default None (serial)
+        chunksize : int, optional
+            number of files sent to a worker process at once, by default 1
+        replace : bool, optional
+            whether already existing groups of a file are replaced (append
+            mode), by default False. Only then the content hash of the files
+            is stored, see isIngested.
+        progress : object, optional
+            object with the methods start(outfiles), called before the first
+            file, and update(filepath, error), called after every file with the
+            exception raised while parsing it or None
+        skip_errors : bool, optional
+            skip files that can not be parsed instead of raising, by default
+            False
 
         Returns
         -------
         None.
 
         """
-        exc = extract.ExtractFile()
+        if progress is not None:
+            progress.start(outfiles)
 
-        for filepath in outfiles:
-            currentFileData = exc.extractFile(filepath)
+        if workers is None or workers <= 1:
+            results = (_parseOutputFileSafe(filepath, self.profiler.enabled, replace) for filepath in outfiles)
+            self._writeResults(hdf5File, results, replace, progress, skip_errors)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = self._iterResults(executor, outfiles, workers, chunksize, replace)
+                self._writeResults(hdf5File, results, replace, progress, skip_errors)
+
+    def _iterResults(self, executor, outfiles, workers, chunksize, content_hash):
+        # results of the files parsed in worker processes in the order of
+        # outfiles, so the layout of the hdf5 File is identical to the serial
+        # case. At most 2 * workers chunks are submitted and not yet written,
+        # the parsed data of a large directory is never held at once.
+        chunks = (outfiles[start:start + chunksize] for start in range(0, len(outfiles), chunksize))
+        pending = collections.deque()
+
+        while True:
+            for chunk in chunks:
+                pending.append(executor.submit(_parseOutputFilesSafe, chunk, self.profiler.enabled, content_hash))
+                if len(pending) >= 2 * workers:
+                    break
+
+            if not pending:
+                break
+
+            yield from pending.popleft().result()
+
+    def _writeResults(self, hdf5File, results, replace, progress, skip_errors):
+        for filepath, pumps, fingerprint, error, profiler in results:
+            self.profiler.merge(profiler)
+            if error is not None and not skip_errors:
+                raise error
+            if error is None:
+                with self.profiler.stage('ingest.write', file=filepath):
+                    self.writePumps(hdf5File, filepath, pumps, fingerprint, replace=replace)
+                self.profiler.count('datasets', self.countDatasets(pumps), file=filepath)
+            else:
+                self.profiler.count('failed', file=filepath)
+            if progress is not None:
+                progress.update(filepath, error)
+
+    def isIngested(self, hdf5File, filepath):
+        """
+        checks whether the data of a .out file is already up to date in the hdf5 File.
 
-            groupstr = self.getGroupfromPath(filepath)
-            # iterates over all unique pump state (indeces)
-            for pump in currentFileData.pump_probe.index.unique(level=0):
-                # creates the base names for the datasets belonging to this pump state
-                # it seems white spaces in the group/ dataset names create problems ...
-                pump_name = pump.replace(' ', '_')
-                dataset_name = groupstr + pump_name + '/' 
-                # create Excitation energy dataset
-                # gets all excitation energies by the 'pump' index
-                # creates new pandas DataFrame with all excitation enegry
-                # associated with the current 'pump' index and converts it to a
-                # numpy array
-                hdf5File.create_dataset(dataset_name + 'exc_energy',
-                                        data=currentFileData.pump_probe.loc[pump, 'Excitation energy'].to_numpy())
-                # create OScillator strength dataset
-                # same procedure as for excitation energy (new DataFrame ->
-                # numpy array)
-                # FIXME: what happens if no oscillator strength is given due to
-                # faield convergence? Is this even possible at this stage?
-                hdf5File.create_dataset(dataset_name + 'osc_strength',
-                                        data=currentFileData.pump_probe.loc[pump, 'Osc. strength'].to_numpy())
+        Size and modification time are compared first, the content hash is
+        only computed if the modification time has changed (e.g. after a copy)
+        and a hash was stored, in which case the stored modification time is
+        updated.
+
+        Parameters
+        ----------
+        hdf5File : h5py File object
+            file object to check
+        filepath : str
+            path to the qchem .out file
+
+        Returns
+        -------
+        bool
+            True if the file does not have to be parsed again
+        """
+        groupstr = self.getGroupfromPath(filepath)
+
+        if groupstr not in hdf5File:
+            return False
+
+        attrs = hdf5File[groupstr].attrs
+        if 'source_size' not in attrs or 'source_mtime_ns' not in attrs:
+            return False
+
+        fingerprint = fileFingerprint(filepath, content_hash=False)
+        if fingerprint['source_size'] != attrs['source_size']:
+            return False
+        if fingerprint['source_mtime_ns'] == attrs['source_mtime_ns']:
+            return True
+
+        if 'source_sha1' in attrs and fileFingerprint(filepath)['source_sha1'] == attrs['source_sha1']:
+            attrs['source_mtime_ns'] = fingerprint['source_mtime_ns']
+            return True
+
+        return False
+
+    def writePumps(self, hdf5File, filepath, pumps, fingerprint=None, replace=False):
+        """
+        writes the parsed pump-probe data of a single .out file to the HDF5.
+
+        Parameters
+        ----------
+        hdf5File : h5py File object
+            file object to which the data is to be appended
+        filepath : str
+            path to the qchem .out file the data belongs to
+        pumps : list(tuple)
+            (pump_name, exc_energy, osc_strength, overlap, probe_names) as
+            returned by parseOutputFile
+        fingerprint : dict, optional
+            fingerprint of the .out file stored as attributes of its group
+        replace : bool, optional
+            whether an already existing group is deleted first, by default False
+        """
+        groupstr = self.getGroupfromPath(filepath)
+
+        if replace and groupstr in hdf5File:
+            del hdf5File[groupstr]
+
+        if pumps:
+            structurGroup = hdf5File.require_group(groupstr)
+            if self.layout == 'block':
+                self.writeBlock(structurGroup, pumps)
+            else:
+                for pump_name, exc_energy, osc_strength, _, _ in pumps:
+                    pumpGroup = structurGroup.create_group(pump_name)
+                    pumpGroup.create_dataset('exc_energy', data=exc_energy,
+                                             **datasetOptions(exc_energy.size, self.dataset_options))
+                    # FIXME: what happens if no oscillator strength is given due to
+                    # faield convergence? Is this even possible at this stage?
+                    pumpGroup.create_dataset('osc_strength', data=osc_strength,
+                                             **datasetOptions(osc_strength.size, self.dataset_options))
+
+        self.blocks[tuple(groupstr.strip('/').split('/', 1))] = self.getPeakBlock(pumps)
+
+        if fingerprint is not None:
+            group = hdf5File.require_group(groupstr)
+            group.attrs['source_file'] = filepath.replace(self.pathname, '')
+            for key, value in fingerprint.items():
+                group.attrs[key] = value
+            # a hash of a former version of the file would be stale
+            if 'source_sha1' not in fingerprint and 'source_sha1' in group.attrs:
+                del group.attrs['source_sha1']
+
+    def writeBlock(self, structurGroup, pumps):
+        """
+        writes the pump-probe data of a file as a single 2-D dataset (block layout).
+
+        Parameters
+        ----------
+        structurGroup : h5py Group
+            group of the structure
+        pumps : list(tuple)
+            as returned by parseOutputFile
+        """
+        counts = [pump[1].shape[0] for pump in pumps]
+        data = np.column_stack([np.concatenate([pump[i] for pump in pumps]) for i in range(1, 4)])
+
+        dataset = structurGroup.create_dataset(peaktable.BLOCK, data=data,
+                                               **datasetOptions(data.size, self.dataset_options))
+        dataset.attrs['columns'] = np.asarray(peaktable.COLUMNS, dtype='S')
+        dataset.attrs['pumps'] = np.asarray([pump[0] for pump in pumps], dtype='S')
+        dataset.attrs['pump_offsets'] = np.concatenate(([0], np.cumsum(counts)))
+
+    def countDatasets(self, pumps):
+        """number of datasets writePumps creates for pumps"""
+        if self.layout == 'block':
+            return 1 if pumps else 0
+        return 2 * len(pumps)
+
+    def getPeakBlock(self, pumps):
+        """
+        converts the parsed pump-probe data of a file into a block of the peak table.
+
+        Parameters
+        ----------
+        pumps : list(tuple)
+            as returned by parseOutputFile
+
+        Returns
+        -------
+        dict
+            block as created by peaktable.peakBlock
+        """
+        if not pumps:
+            return peaktable.peakBlock([], [], [])
+
+        pump_names = np.repeat([pump[0] for pump in pumps], [pump[1].shape[0] for pump in pumps])
+        exc_energy, osc_strength, overlap, probe_names = (
+            np.concatenate([pump[i] for pump in pumps]) for i in range(1, 5))
+
+        return peaktable.peakBlock(pump_names, exc_energy, osc_strength, overlap, probe_names)
 
     def getGroupfromPath(self, filepath):
         """
@@ -229,12 +654,17 @@ class TAtoHDF5:
                         time = float(line.split()[0])
                         pop = [float(i) for i in line.split()[1:]]
                     
-                        if hdf5File['{time}/{structur}'.format(time=time,structur=structur)]:
-                            hdf5File.create_dataset('/{time}/{structur}/{pattern}'.format(time=time,structur=structur, pattern=pattern), data=pop)
+                        structurGroup = hdf5File['{time}/{structur}'.format(time=time,structur=structur)]
+                        if structurGroup:
+                            # replaces the population of a previous run
+                            if pattern in structurGroup:
+                                del structurGroup[pattern]
+                            structurGroup.create_dataset(pattern, data=pop)
                     
                     except (IndexError, KeyError):
-                        print('Index or Key Error encountered in {time}/{structur}, {pattern}'.format(time=time, structur=structur, pattern=pattern))
-                        pass
+                        # empty line or time step without (parsed) output
+                        self.missing.append((popFile, line.rstrip('\n')))
+                        self.profiler.count('missing_' + pattern, file=popFile)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,15 @@
 # from dataclasses import dataclass
+import collections
+import copy
 import enum
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import h5py
 import traceback
 import numpy as np
 import scipy as sp
+import scipy.fft
+
+from qextract import peaktable, profiling, timeindex
 
 # FIXME: no normalization condition implemented
 # FIXME: only pump states with name X_(1)_A currently working!
@@ -11,12 +17,20 @@ import scipy as sp
 # TODO: add checks that warn if different amount of structures are used
 #       at different times!
 
-# `values` should be sorted
+# `array` has to be ascending, the nearest element is found by binary search
+# (O(log n), the order is not checked). Descending arrays can be searched as
+# array[::-1], the time steps of an hdf5 File with TimeIndex.nearest.
 def find_nearest(array, value):
+    if np.ndim(value):
+        return timeindex.nearestIndex(array, value)
+    # scalar fast path of timeindex.nearestIndex, on ties the smaller element
     array = np.asarray(array)
-    idx = (np.abs(array - value)).argmin()
-    
-    return idx
+    right = int(np.searchsorted(array, value))
+    if right == 0:
+        return 0
+    if right == array.shape[0]:
+        return right - 1
+    return right if array[right] - value < value - array[right - 1] else right - 1
 
 def lorentzian(x, exc, osc, std_devi=0.4):
     if np.isnan(exc) or np.isnan(osc):
@@ -26,6 +40,212 @@ def lorentzian(x, exc, osc, std_devi=0.4):
     else:
         return osc / (1 + np.power((x - exc) / (std_devi/2), 2))
 
+def lorentzianBatch(x, exc, osc, std_devi=0.4, max_size=2**22):
+    """sum of the lorentzians of all peaks, evaluated on x.
+
+    Equivalent to summing lorentzian(x, e, o, std_devi) over all pairs of exc
+    and osc, but evaluated as one broadcasted (n_peaks, n_x) matrix per chunk
+    of peaks. Peaks with NaN energy or strength and zero strength are masked.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        energy grid
+    exc : array_like
+        excitation energies of the peaks
+    osc : array_like
+        oscillator strengths (or any other weights) of the peaks
+    std_devi : float, optional
+        full width at half maximum, by default 0.4
+    max_size : int, optional
+        maximal number of elements of the temporary matrix, by default 2**22
+        (32 MiB)
+
+    Returns
+    -------
+    np.ndarray
+        spectrum on x
+    """
+    x = np.asarray(x, dtype=np.float64)
+    exc = np.asarray(exc, dtype=np.float64).ravel()
+    osc = np.asarray(osc, dtype=np.float64).ravel()
+
+    mask = ~(np.isnan(exc) | np.isnan(osc)) & (osc != 0)
+    exc = exc[mask]
+    osc = osc[mask]
+
+    y = np.zeros(x.shape)
+    chunk = max(1, max_size // max(x.size, 1))
+    half_width = std_devi / 2
+
+    for start in range(0, exc.size, chunk):
+        # (n_chunk, n_x): 1 / (1 + ((x - exc) / (std_devi/2))**2), built in place
+        tmp = np.subtract.outer(exc[start:start + chunk], x)
+        tmp /= half_width
+        np.square(tmp, out=tmp)
+        tmp += 1
+        np.reciprocal(tmp, out=tmp)
+        y += osc[start:start + chunk] @ tmp
+
+    return y
+
+
+def lorentzianSweep(x, exc, osc, std_devis, max_size=2**22):
+    """lorentzianBatch for several widths at once.
+
+    The squared distances of the peaks to the grid are computed once per chunk
+    of peaks and reused for every width.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        energy grid
+    exc : array_like
+        excitation energies of the peaks
+    osc : array_like
+        oscillator strengths (or any other weights) of the peaks
+    std_devis : array_like
+        full widths at half maximum
+    max_size : int, optional
+        maximal number of elements of a temporary matrix, by default 2**22
+
+    Returns
+    -------
+    np.ndarray
+        (n_std_devi, n_x) spectra
+    """
+    x = np.asarray(x, dtype=np.float64)
+    exc = np.asarray(exc, dtype=np.float64).ravel()
+    osc = np.asarray(osc, dtype=np.float64).ravel()
+    std_devis = np.atleast_1d(np.asarray(std_devis, dtype=np.float64))
+
+    mask = ~(np.isnan(exc) | np.isnan(osc)) & (osc != 0)
+    exc = exc[mask]
+    osc = osc[mask]
+
+    y = np.zeros((std_devis.shape[0], x.size))
+    chunk = max(1, max_size // max(x.size, 1) // 2)
+
+    for start in range(0, exc.size, chunk):
+        distance = np.subtract.outer(exc[start:start + chunk], x)
+        np.square(distance, out=distance)
+        tmp = np.empty_like(distance)
+        for k, std_devi in enumerate(std_devis):
+            np.multiply(distance, 1 / (std_devi / 2)**2, out=tmp)
+            tmp += 1
+            np.reciprocal(tmp, out=tmp)
+            y[k] += osc[start:start + chunk] @ tmp
+
+    return y
+
+
+def isUniform(x, rtol=1e-6):
+    """whether x is a grid with constant (non zero) spacing"""
+    x = np.asarray(x, dtype=np.float64)
+    if x.ndim != 1 or x.size < 2:
+        return False
+    dx = np.diff(x)
+    return dx[0] != 0 and np.allclose(dx, dx[0], rtol=0, atol=rtol * abs(dx[0]))
+
+
+class FFTBroadening:
+    """lorentzian broadening on a uniform grid by FFT convolution.
+
+    The peaks are binned onto a fine, padded copy of the grid (linear
+    interpolation between the two neighbouring bins, two weighted bincounts)
+    and the resulting stick spectrum is convolved with the lorentzian kernel,
+    whose FFT is computed once. The cost of a spectrum is O(N log N) in the
+    size N of the fine grid and independent of the number of peaks.
+
+    The linear binning replaces the lorentzian by its linear interpolation
+    between points of the fine grid, the error relative to the peak height is
+    about (step / std_devi)**2. The grid is oversampled so that this stays
+    below tolerance. Peaks outside of the padded grid are evaluated directly
+    with lorentzianBatch.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        uniform energy grid
+    std_devi : float, optional
+        full width at half maximum, by default 0.4
+    oversample : int, optional
+        points of the fine grid per grid step, by default chosen from tolerance
+    pad : int, optional
+        grid steps added on both sides, by default half the grid
+    tolerance : float, optional
+        binning error relative to the peak height used to choose oversample,
+        by default 1e-3
+    """
+
+    def __init__(self, x, std_devi=0.4, oversample=None, pad=None, tolerance=1e-3):
+        if not isUniform(x):
+            raise ValueError('FFT broadening requires a uniform energy grid')
+        self.x = np.asarray(x, dtype=np.float64)
+        self.std_devi = std_devi
+
+        dx = self.x[1] - self.x[0]
+        half_width = std_devi / 2
+        if oversample is None:
+            oversample = max(1, int(np.ceil(abs(dx) / (2 * half_width * np.sqrt(tolerance)))))
+        if pad is None:
+            pad = self.x.size // 2
+        self.oversample = oversample
+        self.step = dx / oversample
+        self.start = self.x[0] - pad * dx
+        self.n_fine = (self.x.size - 1 + 2 * pad) * oversample + 1
+        # grid points within the fine grid
+        self.samples = slice(pad * oversample, (pad + self.x.size - 1) * oversample + 1, oversample)
+
+        # kernel of the circular convolution, long enough to avoid wrap around
+        self.n_fft = sp.fft.next_fast_len(2 * self.n_fine - 1, real=True)
+        kernel = np.zeros(self.n_fft)
+        offsets = np.arange(self.n_fine) * self.step / half_width
+        kernel[:self.n_fine] = 1 / (1 + offsets**2)
+        kernel[self.n_fft - self.n_fine + 1:] = kernel[self.n_fine - 1:0:-1]
+        self.kernel_fft = sp.fft.rfft(kernel)
+
+    def __call__(self, exc, osc):
+        """
+        sum of the lorentzians of all peaks on the grid, see lorentzianBatch.
+
+        Parameters
+        ----------
+        exc : array_like
+            excitation energies of the peaks
+        osc : array_like
+            oscillator strengths (or any other weights) of the peaks
+
+        Returns
+        -------
+        np.ndarray
+            spectrum on the grid
+        """
+        exc = np.asarray(exc, dtype=np.float64).ravel()
+        osc = np.asarray(osc, dtype=np.float64).ravel()
+
+        mask = ~(np.isnan(exc) | np.isnan(osc)) & (osc != 0)
+        pos = (exc[mask] - self.start) / self.step
+        osc = osc[mask]
+
+        inside = (pos >= 0) & (pos <= self.n_fine - 1)
+        if inside.all():
+            y = np.zeros(self.x.shape)
+        else:
+            y = lorentzianBatch(self.x, exc[mask][~inside], osc[~inside], std_devi=self.std_devi)
+
+        if inside.any():
+            pos = pos[inside]
+            osc = osc[inside]
+            index = np.minimum(pos.astype(np.intp), self.n_fine - 2)
+            frac = pos - index
+            sticks = (np.bincount(index, osc * (1 - frac), minlength=self.n_fine)
+                      + np.bincount(index + 1, osc * frac, minlength=self.n_fine))
+            spectrum = sp.fft.irfft(sp.fft.rfft(sticks, self.n_fft) * self.kernel_fft, self.n_fft)
+            y += spectrum[self.samples]
+
+        return y
+
 
 def norm_frob(array):
     return array / np.linalg.norm(array, ord='fro')
@@ -40,50 +260,301 @@ def frobeniusDist(ta, tmp):
     return np.sqrt(np.power(ta-tmp, 2).sum())
 class TA():
 
-    def __init__(self, x, y, z, tensor, x_unit=None, y_unit=None, z_unit=None) -> None:
+    def __init__(self, x, y, z, tensor, x_unit=None, y_unit=None, z_unit=None, ta=None) -> None:
+        # tensor may also be an h5py Dataset (see GetTA tensor_file), which is
+        # only read when sliced, or None if only the summed map was kept
         self.tensor = tensor
-        self.ta = np.sum(tensor, axis=2)
+        self.ta = np.sum(tensor, axis=2) if ta is None else ta
+        # h5py File the tensor is read from, closed by close()
+        self.tensorFile = None
         self.z = z
         self.x = x
         self.y = y
         self.x_unit = x_unit
         self.y_unit = y_unit
         self.z_unit = z_unit
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """closes the tensor file (see GetTA tensor_file), the tensor is dropped"""
+        if self.tensorFile is not None:
+            self.tensorFile.close()
+            self.tensorFile = None
+            self.tensor = None
+
+    def _requireTensor(self):
+        if self.tensor is None:
+            raise ValueError('the per trajectory tensor was not kept, build the TA without chunk_size '
+                             'or with a tensor_file to compute the convergence')
         
     def convergence(self, criterion, norm=norm_frob, errorfunc=frobeniusDist):
-        ta = norm(self.tensor[...,0])
-        for i in range(2, self.tensor.shape[-1]):
-            # TODO: Normalization of arrays still mising, convergence can not be achieved 
-            #       this way
-            tmp = np.copy(ta)
-            ta = norm(self.tensor[...,:i].sum(axis=-1))
-            err = errorfunc(tmp, ta)
+        self._requireTensor()
+        ta, err, i = norm(np.array(self.tensor[...,0])), np.nan, 1
+        # TODO: Normalization of arrays still mising, convergence can not be achieved 
+        #       this way
+        for i, ta, err in self._iterConvergence(norm, errorfunc, stop=self.tensor.shape[-1]):
             if err < criterion:
                 return ta, err, i
         # this should be deleted at some point:
         print('convergence criterion not met!')
         return ta, err, i
 
+    def convergenceCurve(self, norm=norm_frob, errorfunc=frobeniusDist, order=None):
+        """error between the normalized TA of i-1 and i trajectories for all i.
+
+        Parameters
+        ----------
+        norm : callable, optional
+            normalization applied to the summed TA, by default norm_frob
+        errorfunc : callable, optional
+            error between two normalized TAs, by default frobeniusDist
+        order : array_like, optional
+            order in which the trajectories are added, by default as stored
+
+        Returns
+        -------
+        numbers : np.ndarray
+            number of trajectories i = 2, ..., n_trajectories
+        errors : np.ndarray
+            errorfunc(norm(TA_{i-1}), norm(TA_i))
+        """
+        errors = [err for _, _, err in self._iterConvergence(norm, errorfunc, order=order)]
+        return np.arange(2, len(errors) + 2), np.asarray(errors)
+
+    def bootstrapConvergence(self, n_samples, norm=norm_frob, errorfunc=frobeniusDist, workers=None, seed=None):
+        """convergence curves for random orderings of the trajectories.
+
+        The curves are computed in a thread pool (the work is done in numpy),
+        a tensor backed by an hdf5 Dataset is read into memory once for this.
+
+        Parameters
+        ----------
+        n_samples : int
+            number of random orderings
+        norm : callable, optional
+            normalization applied to the summed TA, by default norm_frob
+        errorfunc : callable, optional
+            error between two normalized TAs, by default frobeniusDist
+        workers : int, optional
+            number of threads, by default None (ThreadPoolExecutor default)
+        seed : int, optional
+            seed of the random orderings
+
+        Returns
+        -------
+        numbers : np.ndarray
+            number of trajectories i = 2, ..., n_trajectories
+        errors : np.ndarray
+            (n_samples, n_trajectories - 1) error curves
+        """
+        self._requireTensor()
+        tensor = self.tensor if isinstance(self.tensor, np.ndarray) else self.tensor[()]
+        sample = TA(self.x, self.y, self.z, tensor, ta=self.ta)
+
+        rng = np.random.default_rng(seed)
+        orders = [rng.permutation(tensor.shape[-1]) for _ in range(n_samples)]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            curves = list(executor.map(
+                lambda order: sample.convergenceCurve(norm, errorfunc, order=order)[1], orders))
+
+        return np.arange(2, tensor.shape[-1] + 1), np.asarray(curves).reshape(n_samples, -1)
+
+    def resample(self, times, method='linear', fill_value=np.nan):
+        """summed TA map interpolated onto another time grid.
+
+        Parameters
+        ----------
+        times : array_like
+            new time grid
+        method : str, optional
+            'linear' or 'nearest', by default 'linear'
+        fill_value : float, optional
+            value of times outside of the time steps, by default NaN
+
+        Returns
+        -------
+        TA
+            map on the new grid, without tensor
+        """
+        source = np.asarray(self.x, dtype=np.float64)
+        order = np.argsort(source, kind='stable')
+        source = source[order]
+        ta = np.asarray(self.ta)[order]
+        times = np.atleast_1d(np.asarray(times, dtype=np.float64))
+
+        if method == 'nearest':
+            resampled = ta[timeindex.nearestIndex(source, times)]
+        elif method == 'linear' and source.shape[0] == 1:
+            resampled = np.repeat(ta, times.shape[0], axis=0)
+        elif method == 'linear':
+            right = np.clip(np.searchsorted(source, times), 1, source.shape[0] - 1)
+            left = right - 1
+            weight = ((times - source[left]) / (source[right] - source[left]))[:, None]
+            resampled = ta[left] * (1 - weight) + ta[right] * weight
+        else:
+            raise ValueError("method has to be 'linear' or 'nearest', not {!r}".format(method))
+
+        outside = (times < source[0]) | (times > source[-1])
+        resampled[outside] = fill_value
+
+        return TA(times, self.y, self.z, None, self.x_unit, self.y_unit, self.z_unit, ta=resampled)
+
+    def _iterConvergence(self, norm, errorfunc, order=None, stop=None):
+        # running sum over the trajectories, every trajectory is added once
+        self._requireTensor()
+        n = self.tensor.shape[-1]
+        order = np.arange(n) if order is None else np.asarray(order)
+        stop = n + 1 if stop is None else stop
+
+        running = np.array(self.tensor[..., order[0]], dtype=np.float64)
+        ta = norm(running.copy())
+
+        for i in range(2, stop):
+            running += self.tensor[..., order[i-1]]
+            tmp, ta = ta, norm(running.copy())
+            yield i, ta, errorfunc(tmp, ta)
+
+
+class DiabaticTA():
+    """
+    summed TA maps of the diabatic states, see GetTA.diabaticDecomposition.
+
+    The maps of the states are sums over the structures of a state and carry
+    no per trajectory tensor, convergence is available for the map of all
+    structures (total) only.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        time steps
+    y : np.ndarray
+        energy grid
+    states : np.ndarray
+        diabatic states
+    maps : np.ndarray
+        (n_time, n_wavelength, n_state) summed map of every state
+    total : TA
+        map of all structures, with the per trajectory tensor if it was kept
+    """
+
+    def __init__(self, x, y, states, maps, total) -> None:
+        self.x = x
+        self.y = y
+        self.states = states
+        self.maps = maps
+        self.total = total
+
+    @property
+    def ta(self):
+        """summed map of all structures"""
+        return self.total.ta
+
+    def __getitem__(self, state):
+        """summed map of a diabatic state"""
+        return self.maps[:, :, int(np.flatnonzero(self.states == state)[0])]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """closes the tensor file of total"""
+        self.total.close()
+
+
+# GetTA copy of a worker process, set once per process by _initTrajectoryWorker
+_worker = None
+
+
+def _initTrajectoryWorker(getTA):
+    # initializer of the worker processes: the GetTA copy is received once
+    # and the hdf5 File is opened read only for all tasks of the worker. The
+    # peak table is read per task, only the rows of its trajectories (see
+    # GetTA.sliced_table).
+    global _worker
+    _worker = getTA
+    _worker.hdf5File = h5py.File(getTA.filepath, 'r')
+
+
+def _getTrajectoryBlock(trajectories, states=False):
+    # module level so it can be sent to worker processes, computes the spectra
+    # of a slice of trajectories. The records of the worker profiler and the
+    # missing pump states are returned, fresh ones record the next task.
+    profiler, missing = _worker.profiler, _worker.missing
+    block = _worker._getTrajectoryBlock(trajectories, states)
+    _worker.profiler = profiling.Profiler() if profiler.enabled else profiler
+    _worker.missing = []
+    return block, profiler, missing
+
 
 class GetTA():
 
-    def __init__(self, filepath, wavelength_arr, time_arr=None, std_devi=0.4, trajectories=None, trajectory_mode='strict', diabatic_state=None) -> None:
-        self.std_devi = 0.4
+    def __init__(self, filepath, wavelength_arr, time_arr=None, std_devi=0.4, trajectories=None, trajectory_mode='strict', diabatic_state=None, use_peak_table=True,
+                 chunk_size=None, tensor_file=None, progress=None, profiler=None, broadening='direct',
+                 build=True, workers=None, time_range=None) -> None:
+        self.std_devi = std_devi
+        self.filepath = filepath
         self.wavelength_arr = wavelength_arr
+        # 'direct': lorentzianBatch on any grid, 'fft': FFTBroadening on a
+        # uniform grid
+        if broadening == 'fft':
+            self.broadener = FFTBroadening(wavelength_arr, self.std_devi)
+        elif broadening == 'direct':
+            self.broadener = None
+        else:
+            raise ValueError("broadening has to be 'direct' or 'fft', not {!r}".format(broadening))
+        # object with start(trajectories) and update(trajectory, error) methods
+        self.progress = progress
+        self.profiler = profiler if profiler is not None else profiling.NULL
+        # (structure group, pump group) of populated pump states without
+        # data, counted as 'missing_pump' by the profiler
+        self.missing = []
+        # streaming mode: trajectories are processed chunk_size at a time and
+        # the per trajectory tensor is either written to tensor_file or dropped
+        self.chunk_size = chunk_size
+        self.tensor_file = tensor_file
+        # number of processes the trajectories are distributed to, each opens
+        # the hdf5 File read only, by default None (serial)
+        self.workers = workers
+        self.use_peak_table = use_peak_table
+        # selected peaks per time step, see getPeaks
+        self.peaks = None
         if isinstance(diabatic_state, int):
             self.diabatic=True
             self.diabatic_state=diabatic_state
         else:
             self.diabatic=False
 
-        with h5py.File(filepath, 'r') as hdf5File:
+        with h5py.File(filepath, 'r') as hdf5File, peaktable.openIndex(filepath) as indexFile:
             self.hdf5File = hdf5File
-            
+
+            # streaming mode and worker processes: only the rows of the
+            # trajectories of a block are read from the peak table, see
+            # _getTrajectoryBlock
+            parallel = self.workers is not None and self.workers > 1
+            self.sliced_table = ((self._isStreaming() or parallel) and self.use_peak_table
+                                 and indexFile is not None and peaktable.GROUP in indexFile)
+            if self.sliced_table:
+                self.peak_table = None
+            else:
+                self._readPeakTable(indexFile)
+
+
+            # time_arr: times (or group names) that have to exist, time_range:
+            # (start, stop) window of time steps, by default all time steps
+            self.time_index = timeindex.TimeIndex.read(hdf5File, indexFile)
             if time_arr is not None:
-                if isinstance(time_arr, np.ndarray):
-                    self.time_arr = np.asarray(['{:.1f}'.format(x) for x in time_arr])
-                if isinstance(time_arr, list):
-                    self.time_arr = np.asarray(['{:.1f}'.format(x) for x in time_arr])
+                self.time_arr = np.atleast_1d(self.time_index.lookup(time_arr))
+            elif time_range is not None:
+                self.time_arr = self.time_index.window(*time_range)
             else:
                 self.time_arr = self._getTime(hdf5File)
 
@@ -92,8 +563,21 @@ class GetTA():
             else:
                 self.trajectories=self._getTrajectories(hdf5File, trajectory_mode=trajectory_mode)
             
-            self.ta = self._getTA()
+            # without build only the peaks are prepared, e.g. for sweep
+            self.ta = self._getTA() if build else None
             
+    def _readPeakTable(self, indexFile, trajectories=None):
+        # all peaks (of the trajectories) are read at once from the peak table
+        # if the (current) index File has one, otherwise structure by
+        # structure from the nested groups
+        if self.use_peak_table and indexFile is not None and peaktable.GROUP in indexFile:
+            with self.profiler.stage('ta.read'):
+                self.peak_table = peaktable.PeakTable.read(
+                    indexFile, columns=('pump', 'exc_energy', 'osc_strength'), trajectories=trajectories)
+            self.pump_pop_index = self._getPumpPopIndex(self.peak_table.pumps)
+        else:
+            self.peak_table = None
+
     def _getTrajectories(self, hdf5File, trajectory_mode='strict'):
         
         if trajectory_mode == 'strict':
@@ -111,68 +595,457 @@ class GetTA():
         return tmp_arr
         
     def _getTime(self, hdf5File):
-        sorted_arr = np.fromiter(hdf5File.keys(), dtype=np.float16)
-        sorted_arr = np.sort(sorted_arr)
-        return sorted_arr.astype(str)
+        # group names of all time steps sorted by value, from the index read
+        # in __init__
+        return self.time_index.names
     
     def _calcStateSpectra(self, exc_arr, osc_arr):
 
+        self.profiler.count('peaks', len(exc_arr))
+        with self.profiler.stage('ta.broaden'):
+            if self.broadener is not None:
+                return self.broadener(exc_arr, osc_arr)
+            return lorentzianBatch(self.wavelength_arr, exc_arr, osc_arr, std_devi=self.std_devi)
+
+    def _getStructurSpectra(self, structurGroup, select_diabatic=True):
+
         y = np.zeros_like(self.wavelength_arr)
 
-        for exc, osc in zip(exc_arr, osc_arr):
-            y += lorentzian(self.wavelength_arr, exc,
-                            osc, std_devi=self.std_devi)
+        peaks = self._getStructurPeaks(structurGroup, select_diabatic)
+        if peaks is not None:
+            y += self._calcStateSpectra(*peaks)
 
         return y
 
-    def _getStructurSpectra(self, structurGroup):
-
-        y = np.zeros_like(self.wavelength_arr)
+    def _getStructurPeaks(self, structurGroup, select_diabatic=True):
+        # excitation energies and population weighted oscillator strengths of
+        # the populated pump states, None if there are none
 
         poptype = 'pop'
         k = 1
 
-        if self.diabatic:
-            diapop = structurGroup['diapop'][:]
-            truth_array = np.where(diapop==1)
-            if len(truth_array) > 0:
-                if truth_array[0] != self.diabatic_state:
-                    return np.zeros_like(self.wavelength_arr)
-            else:
-                return np.zeros_like(self.wavelength_arr)
+        if select_diabatic and self.diabatic and not self._inDiabaticState(structurGroup['diapop'][:]):
+            return None
+
+        # all peaks of the structure are collected and broadened at once
+        exc_list = []
+        osc_list = []
 
-        for i, pop in enumerate(structurGroup[poptype]):
+        is_block = peaktable.BLOCK in structurGroup
+        if is_block:
+            # block layout: the whole 2-D dataset is read at once
+            pump_names, pump_offsets, data = peaktable.readBlockDataset(structurGroup)
+            pump_rows = {name: slice(pump_offsets[p], pump_offsets[p + 1]) for p, name in enumerate(pump_names)}
+
+        for i, pop in enumerate(structurGroup[poptype][()]):
             if pop == 1:
                 # S1 (i = 1) is mapped on 2_(1)_XX as ground state is 1_(1)_XX therefore i+1
                 pumpName = '{}_(1)_A'.format(i+k)
+                # both arrays are read before either is appended, so a
+                # missing dataset can not misalign exc_list and osc_list
                 try:
-                    y += pop * self._calcStateSpectra(
-                        structurGroup[pumpName + '/exc_energy'], structurGroup[pumpName + '/osc_strength'])
+                    if is_block:
+                        rows = pump_rows[pumpName]
+                        exc, osc = data[rows, 0], data[rows, 1]
+                    else:
+                        exc = structurGroup[pumpName + '/exc_energy'][()]
+                        osc = structurGroup[pumpName + '/osc_strength'][()]
                 except KeyError:
-                    print('{} @ {}'.format(structurGroup.name, pumpName))
-        return y
+                    self.missing.append((structurGroup.name, pumpName))
+                    self.profiler.count('missing_pump', file=structurGroup.name)
+                    continue
+                exc_list.append(exc)
+                osc_list.append(pop * osc)
+
+        if not exc_list:
+            return None
+
+        return np.concatenate(exc_list), np.concatenate(osc_list)
     
-    def _getTrajectorySpectra(self, trajectory):
+    def _inDiabaticState(self, diapop, diabatic_state=None):
+        diabatic_state = self.diabatic_state if diabatic_state is None else diabatic_state
+        truth_array = np.where(diapop==1)
+        if len(truth_array) > 0:
+            if truth_array[0] != diabatic_state:
+                return False
+        else:
+            return False
+        return True
+
+    def _getPumpPopIndex(self, pump_names):
+        # inverse of the mapping in _getStructurSpectra: pump state '{i+1}_(1)_A'
+        # belongs to the population with index i, -1 for all other pump states
+        pop_index = np.full(len(pump_names), -1)
+        for p, pump_name in enumerate(pump_names):
+            state = pump_name.split('_')[0]
+            if state.isdigit() and pump_name == '{}_(1)_A'.format(state):
+                pop_index[p] = int(state) - 1
+        return pop_index
+
+    def _getTableSpectra(self, time, trajectory, select_diabatic=True):
+        peaks = self._getTablePeaks(time, trajectory, select_diabatic)
+        if peaks is None:
+            return np.zeros_like(self.wavelength_arr)
+
+        return self._calcStateSpectra(*peaks)
+
+    def _getTablePeaks(self, time, trajectory, select_diabatic=True):
+        table = self.peak_table
+        t = table.time_index[time]
+        j = table.traj_index[trajectory]
+
+        if select_diabatic and self.diabatic and not self._inDiabaticState(table['diapop'][t, j]):
+            return None
+
+        rows = table.blockSlice(t, j)
+        pop = table['pop'][t, j]
+        pop_index = self.pump_pop_index[table['pump'][rows]]
+
+        valid = (pop_index >= 0) & (pop_index < pop.shape[0])
+        pop_rows = np.where(valid, pop[np.where(valid, pop_index, 0)], 0)
+        mask = pop_rows == 1
+
+        return table['exc_energy'][rows][mask], pop_rows[mask] * table['osc_strength'][rows][mask]
+
+    def getPeaks(self):
+        """
+        selected peaks of all trajectories per time step.
+
+        The TA map is linear in the peaks, so the map of a time step is the
+        broadened sum of these peaks. They are read once (from the peak table
+        in memory or the hdf5 File) and kept, see sweep.
+
+        Returns
+        -------
+        list(tuple)
+            (exc_energy, weighted osc_strength) for every time in time_arr
+        """
+        if self.peaks is not None:
+            return self.peaks
+
+        if self.peak_table is None and self.sliced_table:
+            with peaktable.openIndex(self.filepath) as indexFile:
+                self._readPeakTable(indexFile)
+
+        with self.profiler.stage('ta.read'):
+            if self.peak_table is not None:
+                self.peaks = [self._collectPeaks(self._getTablePeaks(time, trajectory)
+                                                 for trajectory in self.trajectories)
+                              for time in self.time_arr]
+            else:
+                with h5py.File(self.filepath, 'r') as hdf5File:
+                    self.peaks = [self._collectPeaks(self._getStructurPeaks(hdf5File[time][trajectory])
+                                                     for trajectory in self.trajectories)
+                                  for time in self.time_arr]
+
+        return self.peaks
+
+    def _collectPeaks(self, peaks):
+        peaks = [peak for peak in peaks if peak is not None]
+        if not peaks:
+            return np.zeros(0), np.zeros(0)
+        return np.concatenate([exc for exc, _ in peaks]), np.concatenate([osc for _, osc in peaks])
+
+    def sweep(self, std_devis, wavelength_arr=None):
+        """
+        TA maps for several broadening widths from peaks loaded only once.
+
+        Parameters
+        ----------
+        std_devis : array_like
+            full widths at half maximum
+        wavelength_arr : np.ndarray, optional
+            energy grid, by default the grid of this object. Sweeps over
+            several grids call sweep once per grid, the peaks are reused.
+
+        Returns
+        -------
+        np.ndarray
+            (n_std_devi, n_time, n_wavelength) summed TA maps, for the width
+            and grid of this object equal to ta.ta up to rounding
+        """
+        std_devis = np.atleast_1d(np.asarray(std_devis, dtype=np.float64))
+        wavelength_arr = self.wavelength_arr if wavelength_arr is None else wavelength_arr
+        peaks = self.getPeaks()
+
+        maps = np.zeros((std_devis.shape[0], len(peaks), len(wavelength_arr)))
+        if self.broadener is not None:
+            broadeners = [FFTBroadening(wavelength_arr, std_devi) for std_devi in std_devis]
+
+        with self.profiler.stage('ta.sweep'):
+            for t, (exc, osc) in enumerate(peaks):
+                self.profiler.count('peaks', len(exc))
+                if self.broadener is not None:
+                    for k, broadener in enumerate(broadeners):
+                        maps[k, t] = broadener(exc, osc)
+                else:
+                    maps[:, t] = lorentzianSweep(wavelength_arr, exc, osc, std_devis)
+
+        return maps
+
+    def diabaticDecomposition(self):
+        """
+        summed TA maps of all diabatic states and of all structures in one pass.
+
+        Every structure is read and broadened once, the diabatic states of the
+        structures are kept as masks. The map of a state is the sum over the
+        trajectories with all other structures set to zero, which makes the
+        maps bit-identical to those of one GetTA per diabatic state (with the
+        same chunk_size). The trajectories are processed like in _getTA, in
+        blocks and in worker processes if requested; with chunk_size or
+        tensor_file only the sums are kept in memory.
+
+        Returns
+        -------
+        DiabaticTA
+            maps (n_time, n_wavelength, n_state) of the states and total, the
+            TA of all structures (with tensor as for the TA of this object)
+        """
+        n_traj = len(self.trajectories)
+        shape = (self.time_arr.shape[0], self.wavelength_arr.shape[0], n_traj)
+        streaming = self._isStreaming()
+
+        ta = np.zeros(shape[:2])
+        # (n_time, n_wavelength, n_state) running sums of the states when
+        # streaming, otherwise the whole tensor and the masks
+        # (n_state, n_time, n_trajectory) are summed at the end as in _getTA
+        maps = np.zeros(shape[:2] + (0,))
+        tensor = None if streaming else np.zeros(shape)
+        masks = np.zeros((0, shape[0], n_traj), dtype=bool)
+        dataset = None
+
+        if self.tensor_file is not None:
+            tensorFile = h5py.File(self.tensor_file, 'w')
+            dataset = tensorFile.create_dataset('tensor', shape=shape, dtype=np.float64,
+                                                chunks=self._getTensorChunks(shape) if n_traj else None)
+        if streaming:
+            size = self.chunk_size or 64
+        else:
+            size = 64 if self.workers is None or self.workers <= 1 else -(-n_traj // (4 * self.workers))
+
+        self._startProgress()
+        try:
+            with h5py.File(self.filepath, 'r') as hdf5File:
+                self.hdf5File = hdf5File
+                for start, (block, block_masks) in self._iterTrajectoryBlocks(size, states=True):
+                    stop = start + block.shape[2]
+                    if streaming:
+                        ta += block.sum(axis=2)
+                        if block_masks.shape[0] > maps.shape[2]:
+                            maps = np.concatenate(
+                                (maps, np.zeros(shape[:2] + (block_masks.shape[0] - maps.shape[2],))), axis=2)
+                        for state, mask in enumerate(block_masks):
+                            maps[:, :, state] += np.where(mask[:, None, :], block, 0).sum(axis=2)
+                        if dataset is not None:
+                            dataset[:, :, start:stop] = block
+                    else:
+                        tensor[:, :, start:stop] = block
+                        if block_masks.shape[0] > masks.shape[0]:
+                            masks = np.concatenate(
+                                (masks, np.zeros((block_masks.shape[0] - masks.shape[0],) + masks.shape[1:], dtype=bool)))
+                        masks[:block_masks.shape[0], :, start:stop] = block_masks
+        finally:
+            if dataset is not None:
+                tensorFile.close()
+
+        if streaming:
+            if self.tensor_file is None:
+                total = TA(self.time_arr, self.wavelength_arr, self.trajectories, None, ta=ta)
+            else:
+                tensorFile = h5py.File(self.tensor_file, 'r')
+                total = TA(self.time_arr, self.wavelength_arr, self.trajectories, tensorFile['tensor'], ta=ta)
+                total.tensorFile = tensorFile
+        else:
+            total = TA(self.time_arr, self.wavelength_arr, self.trajectories, tensor)
+            state_maps = [np.sum(np.where(mask[:, None, :], tensor, 0), axis=2) for mask in masks]
+            maps = np.stack(state_maps, axis=2) if state_maps else maps
+
+        return DiabaticTA(self.time_arr, self.wavelength_arr, np.arange(maps.shape[2]), maps, total)
+
+    def _getTrajectoryStates(self, trajectory):
+        # (n_state, n_time) whether the structure of a time step is in a
+        # diabatic state, see _inDiabaticState
+        diapops = []
+        for time in self.time_arr:
+            if self.peak_table is not None:
+                table = self.peak_table
+                diapops.append(table['diapop'][table.time_index[time], table.traj_index[trajectory]])
+            else:
+                structurGroup = self.hdf5File[time][trajectory]
+                diapops.append(structurGroup['diapop'][:] if 'diapop' in structurGroup else np.zeros(0))
+
+        masks = np.zeros((max((diapop.shape[0] for diapop in diapops), default=0), len(diapops)), dtype=bool)
+        for t, diapop in enumerate(diapops):
+            for state in range(diapop.shape[0]):
+                masks[state, t] = self._inDiabaticState(diapop, state)
+        return masks
+
+    def _getTrajectorySpectra(self, trajectory, select_diabatic=True):
         mesh = np.zeros((self.time_arr.shape[0], self.wavelength_arr.shape[0]))
         
-        for t, time in enumerate(self.time_arr):
-            mesh[t,:] = self._getStructurSpectra(self.hdf5File[time][trajectory])
+        with self.profiler.stage('ta.trajectory', file=trajectory):
+            for t, time in enumerate(self.time_arr):
+                if self.peak_table is not None:
+                    mesh[t,:] = self._getTableSpectra(time, trajectory, select_diabatic)
+                else:
+                    mesh[t,:] = self._getStructurSpectra(self.hdf5File[time][trajectory], select_diabatic)
             
         return mesh
     
     def _getAllTrajectories(self):
         tensor = np.zeros((self.time_arr.shape[0], self.wavelength_arr.shape[0], self.trajectories.shape[0]))
         
-        for i, trajectory in enumerate(self.trajectories):
-            tensor[:,:,i] = self._getTrajectorySpectra(trajectory)
+        self._startProgress()
+        size = 64 if self.workers is None or self.workers <= 1 else -(-len(self.trajectories) // (4 * self.workers))
+        for start, block in self._iterTrajectoryBlocks(size):
+            tensor[:,:,start:start + block.shape[2]] = block
             
         return tensor
+
+    def _getTrajectoryBlock(self, trajectories, states=False):
+        # with states all structures are broadened and the (block, masks) of
+        # their diabatic states are returned, see diabaticDecomposition
+        block = np.zeros((self.time_arr.shape[0], self.wavelength_arr.shape[0], len(trajectories)))
+        masks = []
+
+        if self.sliced_table:
+            with peaktable.openIndex(self.filepath) as indexFile:
+                self._readPeakTable(indexFile, trajectories)
+
+        for i, trajectory in enumerate(trajectories):
+            block[:,:,i] = self._getTrajectorySpectra(trajectory, select_diabatic=not states)
+            if states:
+                masks.append(self._getTrajectoryStates(trajectory))
+            self._updateProgress(trajectory)
+
+        if self.sliced_table:
+            # only one block of the peak table is kept in memory
+            self.peak_table = None
+
+        if not states:
+            return block
+
+        block_masks = np.zeros((max((mask.shape[0] for mask in masks), default=0), block.shape[0], len(masks)), dtype=bool)
+        for i, mask in enumerate(masks):
+            block_masks[:mask.shape[0], :, i] = mask
+        return block, block_masks
+
+    def _iterTrajectoryBlocks(self, size, states=False):
+        # (start, block) of consecutive slices of size trajectories in the
+        # order of trajectories, computed here or in worker processes. Every
+        # trajectory is computed by the same code in both cases, so the
+        # results are bit-identical. With states block is (block, masks), see
+        # _getTrajectoryBlock.
+        starts = range(0, len(self.trajectories), size)
+
+        if self.workers is None or self.workers <= 1:
+            for start in starts:
+                yield start, self._getTrajectoryBlock(self.trajectories[start:start + size], states)
+            return
+
+        # at most 2 * workers blocks are submitted and not yet yielded, which
+        # keeps the memory bounded for streaming. The worker copy is made
+        # here (see __getstate__), forked workers would otherwise inherit the
+        # progress and the records of this profiler.
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_initTrajectoryWorker,
+                                 initargs=(copy.copy(self),)) as executor:
+            remaining = iter(starts)
+            pending = collections.deque()
+
+            while True:
+                for start in remaining:
+                    trajectories = self.trajectories[start:start + size]
+                    pending.append((start, trajectories, executor.submit(_getTrajectoryBlock, trajectories, states)))
+                    if len(pending) >= 2 * self.workers:
+                        break
+
+                if not pending:
+                    break
+
+                start, trajectories, future = pending.popleft()
+                block, profiler, missing = future.result()
+                self.profiler.merge(profiler)
+                self.missing.extend(missing)
+                for trajectory in trajectories:
+                    self._updateProgress(trajectory)
+                yield start, block
+
+    def __getstate__(self):
+        # copy sent once to every worker process: the open hdf5 File, the
+        # peak table (read by the worker block by block), the progress and
+        # the results are dropped, a fresh Profiler records the stages of the
+        # worker
+        state = self.__dict__.copy()
+        for key in ('hdf5File', 'peak_table', 'pump_pop_index', 'progress', 'peaks', 'ta'):
+            state.pop(key, None)
+        state['profiler'] = profiling.Profiler() if self.profiler.enabled else profiling.NULL
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.peak_table = None
+        self.missing = []
+        self.progress = None
+        self.peaks = None
+
+    def _startProgress(self):
+        if self.progress is not None:
+            self.progress.start(self.trajectories)
+
+    def _updateProgress(self, trajectory):
+        if self.progress is not None:
+            self.progress.update(trajectory, None)
     
+    def _isStreaming(self):
+        return self.chunk_size is not None or self.tensor_file is not None
+
     def _getTA(self):
+        if self._isStreaming():
+            return self._getTAStreaming()
+
         tensor = self._getAllTrajectories()
         
         return TA(self.time_arr, self.wavelength_arr, self.trajectories, tensor)
 
+    def _getTensorChunks(self, shape, max_bytes=2**20):
+        # one chunk holds a single trajectory and at most max_bytes
+        n_wavelength = min(shape[1], max(1, max_bytes // 8))
+        n_time = min(shape[0], max(1, max_bytes // (8 * n_wavelength)))
+        return (n_time, n_wavelength, 1)
+
+    def _getTAStreaming(self):
+        n_traj = len(self.trajectories)
+        shape = (self.time_arr.shape[0], self.wavelength_arr.shape[0], n_traj)
+        chunk_size = self.chunk_size or 64
+
+        ta = np.zeros(shape[:2])
+        dataset = None
+
+        if self.tensor_file is not None:
+            tensorFile = h5py.File(self.tensor_file, 'w')
+            dataset = tensorFile.create_dataset('tensor', shape=shape, dtype=np.float64,
+                                                chunks=self._getTensorChunks(shape) if n_traj else None)
+
+        self._startProgress()
+        try:
+            for start, block in self._iterTrajectoryBlocks(chunk_size):
+                ta += block.sum(axis=2)
+                if dataset is not None:
+                    dataset[:,:,start:start + block.shape[2]] = block
+        finally:
+            if dataset is not None:
+                tensorFile.close()
+
+        if self.tensor_file is None:
+            return TA(self.time_arr, self.wavelength_arr, self.trajectories, None, ta=ta)
+
+        # kept open read only, the TA object reads from it on demand until it
+        # is closed
+        tensorFile = h5py.File(self.tensor_file, 'r')
+        result = TA(self.time_arr, self.wavelength_arr, self.trajectories, tensorFile['tensor'], ta=ta)
+        result.tensorFile = tensorFile
+        return result
+
     # def _getTimeSpectra(self, timeGroup, structurname=None, **kwargs):
 
     #     y = np.zeros_like(self.wavelength_arr)
@@ -0,0 +1,212 @@
+"""
+sorted, numeric index of the time step groups of an hdf5 File written by
+TAtoHDF5.
+
+The time steps are stored as top level groups named after the directories
+('0.0', '2.0', ..., '1000.5'), so finding a time means parsing and comparing
+group names. The time index stores the parsed values sorted next to the group
+names. Like the peak table it is written to the index File of the hdf5 File
+(see peaktable.indexPath), the top level of the hdf5 File only holds the time
+steps:
+
+/ (root of the index File)
+|---time_index/
+|   |---'values'    (n_time,)   time of every step, sorted
+|   |---'names'     (n_time,)   group name of every step
+
+Lookups are binary searches (numpy.searchsorted): the group of a time, the
+nearest time step and all time steps of a window. Groups whose name is not a
+number (e.g. the peak table of files written by former versions) are not part
+of the index.
+
+Author: Tobias Kaczun
+"""
+import numpy as np
+
+GROUP = 'time_index'
+VERSION = 1
+
+
+def timeValue(name):
+    """time of a group name, None if the name is not a number"""
+    try:
+        return float(name)
+    except ValueError:
+        return None
+
+
+def nearestIndex(sorted_values, values):
+    """
+    indices of the elements of sorted_values nearest to values.
+
+    Parameters
+    ----------
+    sorted_values : array_like
+        ascending values
+    values : array_like or float
+        values to look up
+
+    Returns
+    -------
+    np.ndarray or int
+        on ties the smaller element is taken
+    """
+    sorted_values = np.asarray(sorted_values)
+    values = np.asarray(values, dtype=np.float64)
+
+    right = np.clip(np.searchsorted(sorted_values, values), 1, max(sorted_values.shape[0] - 1, 1))
+    left = right - 1
+    right = np.minimum(right, sorted_values.shape[0] - 1)
+    nearest = np.where(np.abs(sorted_values[right] - values) < np.abs(values - sorted_values[left]), right, left)
+
+    return nearest if nearest.ndim else int(nearest)
+
+
+def writeTimeIndex(hdf5File, indexFile):
+    """
+    (re)writes the time index of the hdf5 File from its top level groups.
+
+    Parameters
+    ----------
+    hdf5File : h5py File object
+        file object written by TAtoHDF5
+    indexFile : h5py File object
+        index File of hdf5File opened for writing
+
+    Returns
+    -------
+    TimeIndex
+    """
+    index = TimeIndex.fromGroups(hdf5File)
+
+    if GROUP in indexFile:
+        del indexFile[GROUP]
+    group = indexFile.create_group(GROUP)
+    group.attrs['version'] = VERSION
+    group.create_dataset('values', data=index.values)
+    group.create_dataset('names', data=np.asarray(index.names, dtype='S'))
+
+    return index
+
+
+class TimeIndex:
+    """
+    time steps of an hdf5 File sorted by value.
+
+    Parameters
+    ----------
+    values : array_like
+        time of every step
+    names : array_like
+        group name of every step
+    """
+
+    def __init__(self, values, names):
+        values = np.asarray(values, dtype=np.float64)
+        order = np.argsort(values, kind='stable')
+        self.values = values[order]
+        self.names = np.asarray(names, dtype=str)[order]
+
+    @classmethod
+    def fromGroups(cls, hdf5File):
+        """builds the index from the names of the top level groups"""
+        names = [name for name in hdf5File if timeValue(name) is not None]
+        return cls([timeValue(name) for name in names], names)
+
+    @classmethod
+    def read(cls, hdf5File, indexFile=None):
+        """
+        reads the stored index, which is rebuilt from the group names if
+        there is no index File.
+
+        The index File is only passed on as long as the hdf5 File has not
+        changed since it was written (see peaktable.openIndex), so the
+        stored index is used without listing the groups again.
+
+        Parameters
+        ----------
+        hdf5File : h5py File object
+            file object written by TAtoHDF5
+        indexFile : h5py File object, optional
+            index File of hdf5File, see peaktable.openIndex
+
+        Returns
+        -------
+        TimeIndex
+        """
+        if indexFile is not None and GROUP in indexFile:
+            group = indexFile[GROUP]
+            return cls(group['values'][()], group['names'][()].astype(str))
+
+        return cls.fromGroups(hdf5File)
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def nearest(self, times):
+        """
+        group names of the time steps nearest to times.
+
+        Parameters
+        ----------
+        times : array_like or float
+
+        Returns
+        -------
+        np.ndarray or str
+        """
+        if not len(self):
+            raise KeyError('the time index is empty')
+        return self.names[nearestIndex(self.values, times)]
+
+    def lookup(self, times, tolerance=1e-6):
+        """
+        group names of times, which have to match a time step.
+
+        Parameters
+        ----------
+        times : array_like or float
+            times, group names are accepted as well
+        tolerance : float, optional
+            maximal absolute deviation, by default 1e-6
+
+        Returns
+        -------
+        np.ndarray or str
+
+        Raises
+        ------
+        KeyError
+            if a time does not belong to any time step
+        """
+        values = np.asarray([timeValue(time) if isinstance(time, str) else time for time in np.ravel(times)],
+                            dtype=np.float64)
+        if not len(self):
+            raise KeyError('no time steps for {}'.format(values))
+
+        index = nearestIndex(self.values, values)
+        missing = np.abs(self.values[index] - values) > tolerance
+        if missing.any():
+            raise KeyError('no time steps for {}'.format(values[missing]))
+
+        names = self.names[index]
+        return names if np.ndim(times) else names[0]
+
+    def window(self, start=None, stop=None):
+        """
+        group names of the time steps with start <= time <= stop.
+
+        Parameters
+        ----------
+        start : float, optional
+            by default from the first time step
+        stop : float, optional
+            by default up to the last time step
+
+        Returns
+        -------
+        np.ndarray
+        """
+        first = 0 if start is None else np.searchsorted(self.values, start, side='left')
+        last = len(self) if stop is None else np.searchsorted(self.values, stop, side='right')
+        return self.names[first:last]
@@ -0,0 +1,55 @@
+"""
+shared fixtures: a small TA directory tree built from the sample FANO output
+in data/.
+
+Author: Tobias Kaczun
+"""
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+FANO_OUTPUT = os.path.join(DATA, 'gs_631ppGss.out')
+# pumped states 2 (1) A ... 11 (1) A of the sample output
+N_PUMP = 10
+
+
+def writeTree(root, n_times=3, n_structures=4, seed=0):
+    """
+    writes the layout expected by TAtoHDF5, every output is a copy of the
+    sample FANO output, the trajectories differ by their populations:
+
+    root/0.0/Structure0_631ppGss.out
+    root/2.0/...
+    root/Structure0_pop.dat
+    root/Structure0_diapop.dat
+    """
+    rng = np.random.default_rng(seed)
+    times = [2.0 * t for t in range(n_times)]
+
+    for time in times:
+        time_dir = os.path.join(root, '{:.1f}'.format(time))
+        os.makedirs(time_dir, exist_ok=True)
+        for s in range(n_structures):
+            shutil.copyfile(FANO_OUTPUT, os.path.join(time_dir, 'Structure{}_631ppGss.out'.format(s)))
+
+    for s in range(n_structures):
+        with open(os.path.join(root, 'Structure{}_pop.dat'.format(s)), 'w') as popFile, \
+                open(os.path.join(root, 'Structure{}_diapop.dat'.format(s)), 'w') as diapopFile:
+            for time in times:
+                # population index i belongs to the pumped state i + 1
+                pop = np.zeros(N_PUMP + 1)
+                pop[rng.integers(1, N_PUMP + 1)] = 1
+                diapop = np.zeros(3)
+                diapop[rng.integers(0, 3)] = 1
+                popFile.write('{:f} {}\n'.format(time, ' '.join(str(x) for x in pop)))
+                diapopFile.write('{:f} {}\n'.format(time, ' '.join(str(x) for x in diapop)))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = str(tmp_path / 'tree')
+    writeTree(root)
+    return root
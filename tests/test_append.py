@@ -0,0 +1,115 @@
+"""
+incremental append mode of TAtoHDF5: only new or changed .out files are
+parsed, the groups and peak table blocks of changed files are replaced.
+
+Author: Tobias Kaczun
+"""
+import os
+
+import h5py
+import numpy as np
+import pytest
+
+from qextract import peaktable, profiling
+from qextract.ta_extract import TAtoHDF5
+from qextract.ta_util import GetTA
+
+WAVELENGTH = np.linspace(270, 300, 200)
+MODIFIED = os.path.join('2.0', 'Structure1_631ppGss.out')
+
+
+class Recorder:
+    """progress object recording the files of every run"""
+
+    def __init__(self):
+        self.started = []
+        self.updated = []
+
+    def start(self, outfiles):
+        self.started.append(list(outfiles))
+
+    def update(self, filepath, error):
+        self.updated.append((filepath, error))
+
+
+def ingest(root, filename, append=False):
+    taToHDF5 = TAtoHDF5()
+    taToHDF5.profiler = profiling.Profiler()
+    progress = Recorder()
+    taToHDF5.createHDF5(root, filename, append=append, progress=progress)
+    return taToHDF5, progress
+
+
+def modifyOutput(filepath):
+    # same size, only the first pump-probe energy of pump 2 (1) A changes
+    with open(filepath) as outfile:
+        text = outfile.read()
+    with open(filepath, 'w') as outfile:
+        outfile.write(text.replace('2.82474744e+02', '2.90000000e+02'))
+
+
+def readTable(filename):
+    with peaktable.openIndex(filename) as indexFile:
+        assert indexFile is not None
+        return peaktable.PeakTable.read(indexFile)
+
+
+@pytest.fixture
+def ingested(tree, tmp_path):
+    filename = str(tmp_path / 'ta.hdf5')
+    ingest(tree, filename, append=True)
+    return tree, filename
+
+
+def test_unchanged_files_are_skipped(ingested):
+    root, filename = ingested
+    ta = GetTA(filename, WAVELENGTH).ta.ta
+
+    taToHDF5, progress = ingest(root, filename, append=True)
+    assert progress.started == [[]]
+    assert progress.updated == []
+    assert taToHDF5.blocks == {}
+    assert taToHDF5.profiler.counters.get('datasets', 0) == 0
+
+    np.testing.assert_array_equal(GetTA(filename, WAVELENGTH).ta.ta, ta)
+
+
+def test_modified_file_is_replaced(ingested, tmp_path):
+    root, filename = ingested
+    filepath = os.path.join(root, MODIFIED)
+    modifyOutput(filepath)
+
+    _, progress = ingest(root, filename, append=True)
+    assert [os.path.normpath(path) for path in progress.started[0]] == [os.path.normpath(filepath)]
+
+    with h5py.File(filename, 'r') as hdf5File:
+        assert hdf5File['2.0/Structure1/2_(1)_A/exc_energy'][0] == 290.0
+        assert hdf5File['0.0/Structure1/2_(1)_A/exc_energy'][0] == pytest.approx(282.474744)
+
+    block = readTable(filename).block('2.0', 'Structure1')
+    assert block['exc_energy'][0] == 290.0
+
+    # same result as ingesting the modified tree from scratch
+    fresh = str(tmp_path / 'fresh.hdf5')
+    ingest(root, fresh)
+    table, expected = readTable(filename), readTable(fresh)
+    for name in ('pumps', 'offsets', 'present', 'pump', 'exc_energy', 'osc_strength'):
+        np.testing.assert_array_equal(table[name], expected[name], err_msg=name)
+    np.testing.assert_array_equal(GetTA(filename, WAVELENGTH).ta.ta, GetTA(fresh, WAVELENGTH).ta.ta)
+
+
+def test_touched_file_is_skipped(ingested):
+    root, filename = ingested
+    filepath = os.path.join(root, MODIFIED)
+    stat = os.stat(filepath)
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    with h5py.File(filename, 'r') as hdf5File:
+        assert 'source_sha1' in hdf5File['2.0/Structure1'].attrs
+
+    _, progress = ingest(root, filename, append=True)
+    assert progress.started == [[]]
+
+    # the stored modification time is updated, the hash is not needed again
+    with h5py.File(filename, 'r') as hdf5File:
+        assert hdf5File['2.0/Structure1'].attrs['source_mtime_ns'] == stat.st_mtime_ns + 10**9
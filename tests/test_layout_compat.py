@@ -0,0 +1,81 @@
+"""
+compatibility of the hdf5 Files written by TAtoHDF5 with readers that take
+every top level group for a time step (GetTA before the index File).
+
+Author: Tobias Kaczun
+"""
+import h5py
+import numpy as np
+import pytest
+
+from qextract import peaktable, timeindex
+from qextract.ta_extract import TAtoHDF5
+from qextract.ta_util import GetTA, lorentzian
+
+WAVELENGTH = np.linspace(270, 300, 200)
+
+
+def legacyTA(filename, wavelength_arr, std_devi=0.4):
+    # reader logic of the former GetTA: the top level keys are parsed as
+    # times, the trajectories are the structures present at all times
+    with h5py.File(filename, 'r') as hdf5File:
+        time_arr = np.sort(np.fromiter(hdf5File.keys(), dtype=np.float16)).astype(str)
+        trajectories = np.fromiter(hdf5File[time_arr[0]].keys(), dtype='U32')
+        for time in time_arr[1:]:
+            trajectories = np.intersect1d(trajectories, np.fromiter(hdf5File[time].keys(), dtype='U32'))
+
+        ta = np.zeros((time_arr.shape[0], wavelength_arr.shape[0]))
+        for t, time in enumerate(time_arr):
+            for trajectory in trajectories:
+                structurGroup = hdf5File[time][trajectory]
+                for i, pop in enumerate(structurGroup['pop']):
+                    if pop == 1:
+                        pumpName = '{}_(1)_A'.format(i + 1)
+                        for exc, osc in zip(structurGroup[pumpName + '/exc_energy'],
+                                            structurGroup[pumpName + '/osc_strength']):
+                            ta[t] += pop * lorentzian(wavelength_arr, exc, osc, std_devi=std_devi)
+    return ta
+
+
+@pytest.fixture
+def ingested(tree, tmp_path):
+    filename = str(tmp_path / 'ta.hdf5')
+    TAtoHDF5().createHDF5(tree, filename)
+    return tree, filename
+
+
+def test_legacy_reader(ingested):
+    _, filename = ingested
+
+    with h5py.File(filename, 'r') as hdf5File:
+        assert all(timeindex.timeValue(name) is not None for name in hdf5File)
+
+    getTA = GetTA(filename, WAVELENGTH)
+    assert getTA.peak_table is not None
+    np.testing.assert_allclose(legacyTA(filename, WAVELENGTH), getTA.ta.ta, rtol=1e-10)
+
+
+def test_index_file(ingested):
+    _, filename = ingested
+
+    with h5py.File(peaktable.indexPath(filename), 'r') as indexFile:
+        assert peaktable.GROUP in indexFile and timeindex.GROUP in indexFile
+
+    # the index File is ignored once the hdf5 File is changed by other tools
+    with h5py.File(filename, 'a') as hdf5File:
+        hdf5File.copy(hdf5File['4.0'], '6.0')
+    getTA = GetTA(filename, WAVELENGTH)
+    assert getTA.peak_table is None
+    assert list(getTA.time_arr) == ['0.0', '2.0', '4.0', '6.0']
+
+
+def test_append_removes_top_level_index(ingested):
+    root, filename = ingested
+
+    # layout of former versions
+    with h5py.File(filename, 'a') as hdf5File:
+        hdf5File.create_group(peaktable.GROUP)
+        hdf5File.create_group(timeindex.GROUP)
+
+    TAtoHDF5().createHDF5(root, filename, append=True)
+    np.testing.assert_allclose(legacyTA(filename, WAVELENGTH), GetTA(filename, WAVELENGTH).ta.ta, rtol=1e-10)
@@ -0,0 +1,82 @@
+"""
+ScanFile (eager and lazy) has to return the same data as the line by line
+ExtractFile, for single job files and for files with several chained jobs.
+
+Author: Tobias Kaczun
+"""
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+from qextract import extract, scan
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+FILES = sorted(glob.glob(os.path.join(DATA, '*.out')))
+SECTIONS = ('adc', 'pump', 'probe', 'pump_probe')
+
+
+def assertSameData(expected, data):
+    # the lazy sections are compared through the attribute access, which
+    # parses them from the file
+    keys = [key for key in expected.__dict__ if key not in SECTIONS]
+    assert [key for key in data.__dict__ if key not in SECTIONS + ('_lazy',)] == keys
+    for key in keys:
+        assert data.__dict__[key] == expected.__dict__[key], key
+    for key in SECTIONS:
+        if key in expected.__dict__:
+            frame = getattr(data, key)
+            assert isinstance(frame, pd.DataFrame)
+            assert frame.equals(expected.__dict__[key]), key
+
+
+@pytest.fixture
+def multiJob(tmp_path):
+    # chained jobs: the outputs are concatenated, every job of the data
+    # files starts with its 'User input:' section
+    filename = str(tmp_path / 'multi.out')
+    with open(filename, 'w') as multi:
+        for name in FILES:
+            with open(name) as outfile:
+                multi.write(outfile.read())
+    return filename
+
+
+@pytest.mark.parametrize('filename', FILES, ids=os.path.basename)
+@pytest.mark.parametrize('lazy', [False, True])
+def test_extract_file(filename, lazy):
+    expected = extract.ExtractFile().extractFile(filename)
+    assertSameData(expected, scan.ScanFile(lazy=lazy).extractFile(filename))
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_extract_jobs(multiJob, lazy):
+    expected = extract.ExtractFile().extractJobs(multiJob)
+    assert len(expected) == len(FILES)
+
+    jobs = scan.ScanFile(lazy=lazy).extractJobs(multiJob)
+    assert len(jobs) == len(expected)
+    for job, expectedJob in zip(jobs, expected):
+        assertSameData(expectedJob, job)
+
+    # extractFile returns the last job only
+    assertSameData(expected[-1], scan.ScanFile(lazy=lazy).extractFile(multiJob))
+
+
+def test_extract_jobs_workers(multiJob):
+    expected = scan.ScanFile().extractJobs(multiJob)
+    for job, expectedJob in zip(scan.ScanFile().extractJobs(multiJob, workers=2), expected):
+        assertSameData(expectedJob, job)
+
+
+def test_jobs_match_single_files(multiJob):
+    # every job of the concatenated file holds the sections of its source
+    # file (the basis of 'gen' jobs is taken from the file name)
+    for job, name in zip(scan.ScanFile().extractJobs(multiJob), FILES):
+        single = scan.ScanFile().extractFile(name)
+        assert (job.success, job.cpu) == (single.success, single.cpu)
+        for key in SECTIONS:
+            assert (key in job.__dict__) == (key in single.__dict__)
+            if key in single.__dict__:
+                assert job.__dict__[key].equals(single.__dict__[key]), key